@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import statistics
+from browser import Browser
+from scraper import Scraper
+
+def medir_carregamento(perfil_enxuto, ids):
+    """
+    Abre uma sessão com o perfil informado e mede, por ID, o tempo de driver.get + validate_patient.
+    Retorna a lista de tempos em segundos.
+    """
+    browser = Browser(perfil_enxuto=perfil_enxuto)
+    tempos = []
+    try:
+        browser.iniciar_sessao()
+        scraper = Scraper(browser.driver)
+        for id_paciente in ids:
+            inicio = time.perf_counter()
+            browser.driver.get(f"{scraper.url_base}{id_paciente}")
+            scraper.validate_patient(id_paciente)
+            tempos.append(time.perf_counter() - inicio)
+    finally:
+        browser.fechar_navegador()
+    return tempos
+
+def resumir(nome, tempos):
+    if not tempos:
+        return f"{nome}: sem medições"
+    return (f"{nome}: {len(tempos)} IDs, média {statistics.mean(tempos):.2f}s, "
+            f"mediana {statistics.median(tempos):.2f}s, máximo {max(tempos):.2f}s")
+
+if __name__ == "__main__":
+    # Uso: python src/benchmark_carregamento.py [ID_INICIAL] [QUANTIDADE]
+    id_inicial = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv('ID_BASE'))
+    quantidade = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    ids = list(range(id_inicial, id_inicial + quantidade))
+
+    padrao = medir_carregamento(False, ids)
+    enxuto = medir_carregamento(True, ids)
+
+    print(resumir("Perfil padrão", padrao))
+    print(resumir("Perfil enxuto", enxuto))
+    if padrao and enxuto:
+        ganho = statistics.mean(padrao) - statistics.mean(enxuto)
+        print(f"Diferença média por ID: {ganho:.2f}s ({ganho / statistics.mean(padrao):.0%})")
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import statistics
+import pyautogui
+from utils.localizador import LocalizadorImagens, obter_localizador
+
+IMAGENS_PADRAO = ["img/config.png", "img/predef.png", "img/staging.png", "img/close.png", "img/ok.png"]
+
+def medir(funcao, caminho, repeticoes):
+    """
+    Executa funcao(caminho) repetidas vezes e retorna (tempos em segundos, último resultado).
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao(caminho)
+        except Exception:
+            resultado = None
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+def resumir(nome, tempos, resultado):
+    return (f"  {nome}: média {statistics.mean(tempos) * 1000:.1f}ms, "
+            f"mediana {statistics.median(tempos) * 1000:.1f}ms, máximo {max(tempos) * 1000:.1f}ms "
+            f"-> {resultado}")
+
+if __name__ == "__main__":
+    # Uso: python src/benchmark_localizador.py [REPETICOES] [IMAGEM ...]
+    # Exige um display X (ex.: Xvfb) com a tela da extensão aberta.
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    imagens = sys.argv[2:] or IMAGENS_PADRAO
+    config = obter_localizador()
+
+    for imagem in imagens:
+        caminho = imagem if os.path.isabs(imagem) else os.path.join('/app', imagem)
+        if not os.path.exists(caminho):
+            print(f"{caminho}: arquivo não encontrado")
+            continue
+        print(caminho)
+
+        antes, resultado = medir(
+            lambda c: pyautogui.locateCenterOnScreen(c, confidence=config.confianca), caminho, repeticoes
+        )
+        print(resumir("pyautogui (tela inteira, PNG relido)", antes, resultado))
+
+        # Instância nova: a primeira chamada carrega o template e define o último acerto
+        localizador = LocalizadorImagens(config.confianca, config.margem, config.regioes)
+        depois, resultado = medir(localizador.localizar, caminho, repeticoes)
+        print(resumir("LocalizadorImagens (template em cache, região de interesse)", depois, resultado))
+        print(f"  Ganho médio por chamada: {(statistics.mean(antes) - statistics.mean(depois)) * 1000:.1f}ms")
@@ -3,27 +3,141 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
-from utils.helpers import fill_field, click_element, check_text_on_page, log_message, click_image, change_iframe
-import pyautogui
+from utils.helpers import fill_field, click_element, log_message, click_image, change_iframe
+from utils.helpers import fast_fill_field, fast_click_element, wait_text_disappear
+from seletores import PainelExtensao
+from sonda import SondaHttp
+import painel
+from utils.config import obter_secao
+from utils.processos import arvore_processos
 from dotenv import load_dotenv
-import sys
 import os
 import time
+import shutil
+import signal
 import tempfile
+import subprocess
+import socket
+from contextlib import contextmanager
 
 import logging
 logger = logging.getLogger(__name__)
 
 load_dotenv(override=True)
 
+CHROMEDRIVER_LOCAL = "/usr/local/bin/chromedriver"
+
+DIRETORIO_PERFIS = "/tmp"
+PREFIXO_PERFIL = "chrome_profile_"
+
+# Conteúdo do perfil que não vale a pena guardar no modelo
+_IGNORAR_NO_MODELO = shutil.ignore_patterns(
+    "Singleton*", "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "Crashpad"
+)
+
+_chromedriver_cache = None
+
+def resolver_chromedriver(caminho_configurado=None):
+    """
+    Retorna o caminho do chromedriver sem consultas de rede sempre que possível, na ordem:
+    browser.chromedriver_path (ou a variável CHROMEDRIVER_PATH), o binário fixado pelo
+    Dockerfile em /usr/local/bin, o PATH e, por último, o ChromeDriverManager.
+    O caminho resolvido fica em cache para os próximos navegadores do processo.
+    """
+    global _chromedriver_cache
+    if _chromedriver_cache is None:
+        candidatos = [caminho_configurado, os.getenv('CHROMEDRIVER_PATH'), CHROMEDRIVER_LOCAL, shutil.which("chromedriver")]
+        for caminho in candidatos:
+            if caminho and os.path.isfile(caminho) and os.access(caminho, os.X_OK):
+                _chromedriver_cache = caminho
+                break
+        else:
+            logger.warning("Chromedriver local não encontrado. Recorrendo ao ChromeDriverManager.")
+            _chromedriver_cache = ChromeDriverManager().install()
+    return _chromedriver_cache
+
+def _lock_ativo(profile_dir):
+    """
+    Indica se o SingletonLock do perfil aponta para um Chrome ainda vivo neste host.
+    O lock é um symlink para '<hostname>-<pid>'.
+    """
+    try:
+        alvo = os.readlink(os.path.join(profile_dir, "SingletonLock"))
+    except OSError:
+        return False
+    host, _, pid = alvo.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def limpar_perfis_orfaos(idade_minima=600):
+    """
+    Remove perfis temporários do Chrome deixados por execuções anteriores (processo morto
+    antes de fechar_navegador). Perfis com Chrome vivo ou criados há menos de idade_minima
+    segundos (outro processo ainda iniciando o navegador) são mantidos.
+    """
+    removidos = 0
+    agora = time.time()
+    for nome in os.listdir(DIRETORIO_PERFIS):
+        caminho = os.path.join(DIRETORIO_PERFIS, nome)
+        if not nome.startswith(PREFIXO_PERFIL) or not os.path.isdir(caminho):
+            continue
+        try:
+            if _lock_ativo(caminho) or agora - os.path.getmtime(caminho) < idade_minima:
+                continue
+            shutil.rmtree(caminho, ignore_errors=True)
+            removidos += 1
+        except OSError as e:
+            logger.warning(f"Não foi possível remover o perfil órfão {caminho}: {e}")
+    if removidos:
+        print(f"{removidos} perfil(is) temporário(s) órfão(s) removido(s) de {DIRETORIO_PERFIS}.")
+    return removidos
+
 class Browser:
-    def __init__(self):
+    def __init__(self, perfil_enxuto=None, diretorio_perfil=None):
         self.driver = None
         self.wait = None
+        self.painel = None
         self.errors: list[str] = []
+        self.config = obter_secao("browser")
+        # None segue o config.yaml; True/False força o perfil (usado pelo benchmark)
+        self.perfil_enxuto = bool(self.config.get("lean")) if perfil_enxuto is None else perfil_enxuto
+        # Perfil persistente: cookies e login da extensão sobrevivem entre execuções
+        self.diretorio_perfil = diretorio_perfil or self.config.get("profile_dir") or None
+        # Perfil temporário (clone do modelo, quando configurado), removido ao fechar
+        self.perfil_temporario = None
+        self._criar_modelo = None
+        # Perfil que já pode conter sessões válidas: persistente ou clonado do modelo
+        self.reaproveitar_sessao = bool(self.diretorio_perfil)
+        self._sessao_pronta = False
+        self.config_interacao = obter_secao("interaction")
+        # Etapa da inicialização -> duração em segundos, na ordem em que ocorreram
+        self.tempos_inicializacao = {}
+
+    @contextmanager
+    def _medir_etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tempos_inicializacao[nome] = time.perf_counter() - inicio
+
+    def relatorio_inicializacao(self):
+        """
+        Retorna as linhas do relatório de tempo de cada etapa da inicialização da sessão.
+        """
+        linhas = [f"{nome}: {duracao:.2f}s" for nome, duracao in self.tempos_inicializacao.items()]
+        if linhas:
+            linhas.append(f"Total: {sum(self.tempos_inicializacao.values()):.2f}s")
+        return linhas
 
     def open_browser(self):
             """
@@ -35,7 +149,20 @@ class Browser:
             try:
                 options = webdriver.ChromeOptions()
 
-                profile_dir = tempfile.mkdtemp(prefix="chrome_profile_", dir="/tmp")
+                profile_dir = self.diretorio_perfil
+                if profile_dir:
+                    os.makedirs(profile_dir, exist_ok=True)
+                    if not self._liberar_perfil(profile_dir):
+                        # Outro Chrome vivo usa o perfil: roda com um perfil temporário, sem sessão salva
+                        logger.warning(f"Perfil persistente {profile_dir} em uso por outro Chrome. Usando perfil temporário.")
+                        profile_dir = None
+                        self.reaproveitar_sessao = False
+                    else:
+                        print(f"Usando perfil persistente: {profile_dir}")
+                if not profile_dir:
+                    profile_dir = tempfile.mkdtemp(prefix=PREFIXO_PERFIL, dir=DIRETORIO_PERFIS)
+                    self.perfil_temporario = profile_dir
+                    self._preparar_perfil_temporario(profile_dir)
                 options.add_argument(f"--user-data-dir={profile_dir}")
 
                 # Caminho correto da extensão no Docker
@@ -54,22 +181,39 @@ class Browser:
                 options.add_argument("--disable-dev-shm-usage")
                 options.add_experimental_option("excludeSwitches", ["enable-automation"])
                 options.add_experimental_option("useAutomationExtension", False)
-
-                service = Service(ChromeDriverManager().install())
-
-                self.driver = webdriver.Chrome(service=service, options=options)
+                # Diálogos nativos (alert/confirm) da importação são tratados pelo WebDriver, não pela tela
+                options.unhandled_prompt_behavior = self.config.get("unhandled_prompt_behavior", "accept")
+                if self.config.get("headless"):
+                    options.add_argument("--headless=new")
+                    options.add_argument("--window-size=1920,1080")
+                    print("Navegador em modo headless.")
+
+                if self.perfil_enxuto:
+                    # 'eager' devolve o controle no DOMContentLoaded; 'none' logo após iniciar a navegação
+                    options.page_load_strategy = self.config.get("page_load_strategy", "eager")
+                    print(f"Perfil enxuto ativado (pageLoadStrategy={options.page_load_strategy}).")
+
+                with self._medir_etapa("Resolução do chromedriver"):
+                    service = Service(resolver_chromedriver(self.config.get("chromedriver_path")))
+
+                with self._medir_etapa("Abertura do Chrome"):
+                    self.driver = webdriver.Chrome(service=service, options=options)
                 print("Navegador inicializado.")
 
                 self.driver.implicitly_wait(2)
                 self.wait = WebDriverWait(self.driver, 10)
-                self.driver.get("chrome://extensions/shortcuts")  
+                self.painel = PainelExtensao(self.driver)
+                self.aplicar_perfil_enxuto()
+                with self._medir_etapa("Carregamento da extensão"):
+                    self.driver.get("chrome://extensions/shortcuts")
                 link = os.getenv('LINK1')
                 if not link:
                     print("LINK1 não configurado no arquivo .env")
                     return
 
                 print(f"Abrindo o site: {link}")
-                self.driver.get(link)
+                with self._medir_etapa("Carregamento do LINK1"):
+                    self.driver.get(link)
 
                 print("Site aberto com sucesso!")
             except Exception as e:
@@ -77,7 +221,87 @@ class Browser:
                     logger.exception(msg, exc_info=False)
                     self.errors.append(msg)
 
+    def _preparar_perfil_temporario(self, profile_dir):
+        """
+        Com browser.profile_template, clona o perfil modelo (primeiro acesso do Chrome e extensão
+        já inicializados) para o diretório temporário. Usa cópia por reflink quando o sistema de
+        arquivos suporta (cópia instantânea, copy-on-write) e cópia comum caso contrário.
+        Se o modelo ainda não existir, ele será gerado a partir deste perfil ao fechar o navegador.
+        """
+        modelo = self.config.get("profile_template")
+        if not modelo:
+            return
+        if not os.path.isdir(modelo):
+            print(f"Perfil modelo {modelo} ainda não existe. Será criado ao fechar o navegador.")
+            self._criar_modelo = modelo
+            return
+        with self._medir_etapa("Clonagem do perfil modelo"):
+            subprocess.run(["cp", "-a", "--reflink=auto", f"{modelo}/.", profile_dir], check=True)
+        if not self._liberar_perfil(profile_dir):
+            # Modelo copiado enquanto um Chrome o usava: o clone pode estar inconsistente
+            logger.warning(f"Perfil modelo {modelo} em uso por outro Chrome. Iniciando com perfil vazio.")
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            os.makedirs(profile_dir)
+            return
+        self.reaproveitar_sessao = True
+
+    def _salvar_modelo(self):
+        """
+        Copia o perfil desta sessão (já pronta) para o caminho do modelo. A cópia é feita em um
+        diretório ao lado e renomeada, para que outro processo nunca clone um modelo incompleto.
+        """
+        destino = self._criar_modelo
+        provisorio = f"{destino}.{os.getpid()}.tmp"
+        try:
+            shutil.copytree(self.perfil_temporario, provisorio, ignore=_IGNORAR_NO_MODELO, symlinks=True)
+            os.rename(provisorio, destino)
+            print(f"Perfil modelo salvo em {destino}.")
+        except OSError as e:
+            # Outro processo pode ter criado o modelo primeiro
+            logger.warning(f"Não foi possível salvar o perfil modelo: {e}")
+            shutil.rmtree(provisorio, ignore_errors=True)
+
+    @staticmethod
+    def _liberar_perfil(profile_dir):
+        """
+        Remove as travas deixadas por um Chrome encerrado à força. Em um container novo o
+        hostname muda e o Chrome recusaria o perfil como "em uso por outro computador".
+        Se o dono da trava ainda estiver vivo neste host, nada é removido.
+
+        Retorno:
+        - True se o perfil está livre para uso, False se outro Chrome ainda o utiliza.
+        """
+        if _lock_ativo(profile_dir):
+            return False
+        for nome in ("SingletonLock", "SingletonSocket", "SingletonCookie"):
+            caminho = os.path.join(profile_dir, nome)
+            if os.path.lexists(caminho):
+                os.remove(caminho)
+        return True
+
+    def aplicar_perfil_enxuto(self):
+        """
+        Bloqueia via CDP (Network.setBlockedURLs) os recursos listados em browser.blocked_urls.
+        O bloqueio vale para a aba atual; deve ser chamado novamente em cada aba nova.
+        """
+        if not self.perfil_enxuto:
+            return
+        padroes = self.config.get("blocked_urls") or []
+        if not padroes:
+            return
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(padroes)})
+            print(f"{len(padroes)} padrão(ões) de URL bloqueados na aba atual.")
+        except Exception as e:
+            logger.warning(f"Não foi possível aplicar o bloqueio de URLs: {e}")
+
     def perform_actions(self):
+        if self.config.get("headless"):
+            print("AVISO: perform_actions depende da tela e foi ignorado no modo headless.")
+            return
+        import pyautogui
+
         try:
             print("Aguardando extensão carregar...")
             time.sleep(3)
@@ -106,6 +330,28 @@ class Browser:
                 logger.exception(msg, exc_info=False)
                 self.errors.append(msg)
 
+    def _preencher(self, identifier, identifier_type, value, action_name):
+        """
+        Preenche um campo no modo rápido (interaction.fast) ou com o fill_field original.
+        Retorna False se o modo rápido não conseguir confirmar o valor do campo.
+        """
+        if not self.config_interacao.get("fast", True):
+            fill_field(self.driver, identifier, identifier_type, value, action_name)
+            return True
+        return fast_fill_field(self.driver, identifier, identifier_type, value, action_name,
+                               budget=self.config_interacao.get("latency_budget"))
+
+    def _clicar(self, identifier, identifier_type, action_name, navigation_timeout=0):
+        """
+        Clica em um elemento no modo rápido (interaction.fast) ou com o click_element original.
+        """
+        if not self.config_interacao.get("fast", True):
+            click_element(self.driver, identifier, identifier_type, action_name)
+            return True
+        return fast_click_element(self.driver, identifier, identifier_type, action_name,
+                                  budget=self.config_interacao.get("latency_budget"),
+                                  navigation_timeout=navigation_timeout)
+
     def login(self):
         """
         Realiza o login na aplicação.
@@ -119,10 +365,16 @@ class Browser:
             if USE_PERFORM_ACTIONS == 'true':
                 self.perform_actions()
 
-            fill_field(self.driver, 'USERNAME', 'id', email, 'Preenchimento de Email')
-            fill_field(self.driver, 'PASSWORD', 'id', password, 'Preenchimento de Password')
-            click_element(self.driver,'btnEntrar', 'id', 'Click Login')
-            time.sleep(2)
+            if not (self._preencher('USERNAME', 'id', email, 'Preenchimento de Email')
+                    and self._preencher('PASSWORD', 'id', password, 'Preenchimento de Password')):
+                raise Exception("Campos de login do portal não preenchidos.")
+            # Aguarda a troca de página após o envio (no modo original, uma pausa fixa de 2 s)
+            if self.config_interacao.get("fast", True):
+                if not self._clicar('btnEntrar', 'id', 'Click Login', navigation_timeout=10):
+                    raise Exception("Botão de login do portal não encontrado.")
+            else:
+                click_element(self.driver, 'btnEntrar', 'id', 'Click Login')
+                time.sleep(2)
         
         except Exception as e:
                 msg = f"Erro durante log in: {e}"
@@ -144,16 +396,14 @@ class Browser:
         timeout = 60  
 
         try:
+            # Snapshot único do painel: com a extensão já autenticada não há login a fazer
+            estado = painel.capturar_estado(self.driver)
+            if (estado and not estado['login_extensao']
+                    and (estado['paciente_encontrado'] or estado['paciente_nao_encontrado'])):
+                print("Extensão já autenticada.")
+                return
 
-            shadow_host = self.driver.find_element(By.ID, "voiston-container-script")
-
-            shadow_root = shadow_host.shadow_root
-
-            shadow_content = shadow_root.find_element(By.ID, "voiston-content-base")
-
-            entrar_link = WebDriverWait(shadow_content, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > a"))
-            )
+            entrar_link = self.painel.encontrar("link_entrar", timeout=20, clicavel=True)
 
             entrar_link.click()
 
@@ -168,20 +418,18 @@ class Browser:
                     self.driver.switch_to.window(window)
                     break
             
-            fill_field(self.driver, 'mat-input-0', 'id', email, 'Preenchimento de Email')
-            fill_field(self.driver, 'mat-input-1', 'id', password, 'Preenchimento de Password')
-            click_element(self.driver, "//button[contains(., 'Entrar')]", 'xpath', 'Click entrar')
-            while time.time() - start_time < timeout:
-                if not check_text_on_page(self.driver, 'Aguarde enquanto processamos sua requisição...', timeout=timeout):    
-                    log_message("Log-in OK. Continuando ...")
-                    break
-                time.sleep(1)
-                log_message("Aguarde enquanto processamos sua requisição...")
+            if not (self._preencher('mat-input-0', 'id', email, 'Preenchimento de Email')
+                    and self._preencher('mat-input-1', 'id', password, 'Preenchimento de Password')):
+                raise Exception("Campos de login da extensão não preenchidos.")
+            if not self._clicar("//button[contains(., 'Entrar')]", 'xpath', 'Click entrar'):
+                raise Exception("Botão 'Entrar' da extensão não encontrado.")
+            restante = timeout - (time.time() - start_time)
+            if wait_text_disappear(self.driver, 'Aguarde enquanto processamos sua requisição...', timeout=restante):
+                log_message("Log-in OK. Continuando ...")
             else:
-                msg = "Tempo limite excedido ao aguardar o login na extensão."
-                logger.error(msg)
-                self.errors.append(msg)
-                sys.exit(1)
+                # Registrado em self.errors pelo except abaixo; _autenticar lança a exceção,
+                # que o Supervisor trata como falha recuperável
+                raise TimeoutError("Tempo limite excedido ao aguardar o login na extensão.")
             print(" Login realizado com sucesso na extensão!")
             self.driver.switch_to.window(main_window)
 
@@ -195,10 +443,145 @@ class Browser:
             log_message(f"Ação Login concluída em {execution_time:.2f} segundos.")
 
 
+    def sessao_portal_valida(self):
+        """
+        Verifica com uma única requisição HTTP (cookies do navegador) se a página de um
+        paciente abre sem redirecionar para o login do portal.
+        """
+        url_base = os.getenv('LINK_BASE')
+        id_base = os.getenv('ID_BASE')
+        if not url_base or not id_base:
+            return False
+        sonda = None
+        try:
+            sonda = SondaHttp.a_partir_do_driver(self.driver, url_base, concorrencia=1, timeout=10)
+            return sonda.sondar(id_base) is not None
+        except Exception as e:
+            logger.warning(f"Não foi possível verificar a sessão do portal: {e}")
+            return False
+        finally:
+            if sonda:
+                sonda.fechar()
+
+    def sessao_extensao_valida(self, timeout=10):
+        """
+        Abre a página do paciente base e verifica se o painel da extensão mostra o paciente
+        (sessão ativa) em vez do link de login.
+        """
+        url_base = os.getenv('LINK_BASE')
+        id_base = os.getenv('ID_BASE')
+        if not url_base or not id_base:
+            return False
+        try:
+            self.driver.get(f"{url_base}{id_base}")
+            estado = painel.aguardar_estado(
+                self.driver, ['login_extensao', 'paciente_encontrado', 'paciente_nao_encontrado'], timeout=timeout
+            )
+        except Exception as e:
+            logger.warning(f"Não foi possível verificar a sessão da extensão: {e}")
+            return False
+        return bool(estado and estado['condicao'] in ('paciente_encontrado', 'paciente_nao_encontrado'))
+
+    def iniciar_sessao(self):
+        """
+        Abre o navegador, faz login no portal e na extensão.
+        Com perfil persistente ou clonado do modelo, cada login só é refeito se a sessão salva
+        não for mais válida.
+        Lança exceção na primeira etapa que registrar erro.
+        """
+        self.tempos_inicializacao.clear()
+        self.open_browser()
+        if self.errors:
+            raise Exception("Erro na inicialização do navegador.")
+
+        self._autenticar(self.reaproveitar_sessao)
+
+        print("Tempo de inicialização por etapa:")
+        for linha in self.relatorio_inicializacao():
+            print(f"  {linha}")
+
+    def _autenticar(self, verificar_sessao, voltar_ao_login=False):
+        """
+        Faz o login no portal e na extensão. Com verificar_sessao, cada login só é feito se a
+        verificação correspondente falhar; voltar_ao_login abre o LINK1 antes do login no portal
+        (navegador que já estava em outra página).
+        """
+        with self._medir_etapa("Login no portal"):
+            if verificar_sessao and self.sessao_portal_valida():
+                print("Sessão do portal reaproveitada do perfil.")
+            else:
+                if voltar_ao_login:
+                    self.driver.get(os.getenv('LINK1'))
+                self.login()
+        if self.errors:
+            raise Exception("Erro durante o login.")
+
+        with self._medir_etapa("Login na extensão"):
+            if verificar_sessao and self.sessao_extensao_valida():
+                print("Sessão da extensão reaproveitada do perfil.")
+            else:
+                self.ready_for_scraping()
+        if self.errors:
+            raise Exception("Erro durante a preparação para scraping.")
+        self._sessao_pronta = True
+
+    def retomar_sessao(self):
+        """
+        Prepara para uma nova execução um navegador que ficou aberto desde a anterior
+        (modo agendado): fecha abas extras e refaz apenas os logins que expiraram.
+        Lança exceção se o navegador não responder ou um login falhar.
+        """
+        self.tempos_inicializacao.clear()
+        self.errors.clear()
+        handles = self.driver.window_handles
+        for aba in handles[1:]:
+            self.driver.switch_to.window(aba)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+        self.painel.invalidar()
+        self._autenticar(verificar_sessao=True, voltar_ao_login=True)
+        print("Navegador aquecido reaproveitado:")
+        for linha in self.relatorio_inicializacao():
+            print(f"  {linha}")
+
+    def encerrar_forcado(self):
+        """
+        Mata o chromedriver e todos os processos do Chrome descendentes dele, sem passar pelo
+        WebDriver. Usado pelo watchdog quando uma chamada ao navegador não retorna: a
+        chamada pendente falha com erro de conexão em vez de ficar presa.
+        """
+        processo = getattr(getattr(self.driver, "service", None), "process", None)
+        if processo is None:
+            return
+        # Toda a árvore (Chrome, zygote, renderers), lida antes que o kill a desligue do chromedriver
+        pids = arvore_processos(processo.pid)[1:]
+        try:
+            processo.kill()
+        except Exception as e:
+            logger.warning(f"Não foi possível encerrar o chromedriver: {e}")
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        print("Processos do navegador encerrados à força.")
+
     def fechar_navegador(self):
         """
-        Encerra a instância do WebDriver.
+        Encerra a instância do WebDriver e remove o perfil temporário
+        (antes, gera o perfil modelo se ele ainda não existir).
         """
         if self.driver:
-            self.driver.quit()
-            print("Navegador fechado.")
\ No newline at end of file
+            try:
+                self.driver.quit()
+                print("Navegador fechado.")
+            except Exception as e:
+                # Sessão já morta (Chrome travado ou encerrado pelo watchdog)
+                logger.warning(f"Erro ao fechar o navegador: {e}")
+                self.encerrar_forcado()
+            self.driver = None
+        if self.perfil_temporario:
+            if self._criar_modelo and self._sessao_pronta and not os.path.isdir(self._criar_modelo):
+                self._salvar_modelo()
+            shutil.rmtree(self.perfil_temporario, ignore_errors=True)
+            self.perfil_temporario = None
\ No newline at end of file
@@ -1,71 +1,291 @@
 import sqlite3
 import os
-from datetime import datetime
+import math
+import time
+import atexit
+import threading
+from datetime import datetime, date
+from utils.config import obter_secao
+from intervalos import IndiceIntervalos
 
 DB_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pacientes_raspados.db")
 
+# Parâmetros de desempenho (seção 'database' do config.yaml)
+_config_banco = obter_secao("database")
+SYNCHRONOUS = str(_config_banco.get("synchronous", "NORMAL")).upper()
+if SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    print(f"Valor de synchronous '{SYNCHRONOUS}' inválido. Usando NORMAL.")
+    SYNCHRONOUS = "NORMAL"
+TAMANHO_LOTE = max(1, int(_config_banco.get("batch_size", 50)))
+INTERVALO_FLUSH = float(_config_banco.get("flush_interval", 5))
+
+# Status que não conta como verificado: o ID volta a ser processado na próxima varredura
+STATUS_REPROCESSAR = 'erro_geral'
+
+# Uma conexão por thread, reaproveitada entre chamadas
+_local = threading.local()
+
+# Buffer de escrita: registros aguardando gravação em lote
+_lock_pendentes = threading.RLock()
+_pendentes = {}
+# Amostras ID -> data (ISO) aguardando gravação, gravadas junto com os pacientes
+_amostras_pendentes = {}
+# Tempos por etapa (run_id, id_paciente, etapa, inicio, duracao) aguardando gravação
+_tempos_pendentes = []
+_ultimo_flush = time.monotonic()
+
+# Índice em memória dos IDs já verificados (carregado uma vez por execução)
+_indice_verificados = None
+
+def obter_conexao():
+    """
+    Retorna a conexão persistente da thread atual, criando-a em modo WAL se necessário.
+    Uma nova conexão é aberta quando o processo muda (ex.: após fork).
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pid", None) != os.getpid():
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
 def inicializar_banco():
     """
-    Cria a conexão com o banco de dados e a tabela 'pacientes' se ela não existir.
+    Cria a conexão com o banco de dados e as tabelas 'pacientes', 'faixas_varridas', 'fronteiras',
+    'lotes_trabalho', 'amostras_datas' e 'timings' se não existirem.
+    Na primeira execução com a nova tabela, as faixas são derivadas dos pacientes já registrados.
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pacientes (
-                id_paciente INTEGER PRIMARY KEY,
-                nome_paciente TEXT,
-                status TEXT NOT NULL,
-                data_verificacao DATETIME NOT NULL
-            )
-        ''')
-        conn.commit()
-        print(f"Banco de dados '{DB_FILE}' inicializado e tabela 'pacientes' pronta.")
+        conn = obter_conexao()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pacientes (
+                    id_paciente INTEGER PRIMARY KEY,
+                    nome_paciente TEXT,
+                    status TEXT NOT NULL,
+                    data_verificacao DATETIME NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS faixas_varridas (
+                    inicio INTEGER NOT NULL,
+                    fim INTEGER NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_faixas_inicio ON faixas_varridas (inicio)")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fronteiras (
+                    direcao TEXT PRIMARY KEY,
+                    id_fronteira INTEGER NOT NULL,
+                    data_registro DATETIME NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS lotes_trabalho (
+                    inicio INTEGER PRIMARY KEY,
+                    fim INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    dono TEXT,
+                    expira_em REAL,
+                    heartbeat REAL,
+                    tentativas INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS amostras_datas (
+                    id_paciente INTEGER PRIMARY KEY,
+                    data_referencia TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS timings (
+                    run_id TEXT NOT NULL,
+                    id_paciente INTEGER,
+                    etapa TEXT NOT NULL,
+                    inicio DATETIME NOT NULL,
+                    duracao REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_timings_execucao ON timings (run_id, etapa)")
+            if conn.execute("SELECT 1 FROM faixas_varridas LIMIT 1").fetchone() is None:
+                conn.execute('''
+                    INSERT INTO faixas_varridas (inicio, fim)
+                    SELECT MIN(id_paciente), MAX(id_paciente) FROM (
+                        SELECT id_paciente, id_paciente - ROW_NUMBER() OVER (ORDER BY id_paciente) AS grupo
+                        FROM pacientes WHERE status != ?
+                    ) GROUP BY grupo
+                ''', (STATUS_REPROCESSAR,))
+        print(f"Banco de dados '{DB_FILE}' inicializado e tabelas prontas.")
     except Exception as e:
         print(f"Erro ao inicializar o banco de dados: {e}")
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+
+def flush_registros():
+    """
+    Grava em uma única transação todos os registros pendentes no buffer de escrita.
+    Em caso de falha, os registros voltam para o buffer e serão regravados no próximo flush.
+    """
+    global _ultimo_flush
+    with _lock_pendentes:
+        _ultimo_flush = time.monotonic()
+        if not _pendentes and not _amostras_pendentes and not _tempos_pendentes:
+            return
+        registros = list(_pendentes.values())
+        _pendentes.clear()
+        amostras = list(_amostras_pendentes.items())
+        _amostras_pendentes.clear()
+        tempos = list(_tempos_pendentes)
+        _tempos_pendentes.clear()
+        try:
+            conn = obter_conexao()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO amostras_datas (id_paciente, data_referencia) VALUES (?, ?)", amostras
+                )
+                conn.executemany(
+                    "INSERT INTO timings (run_id, id_paciente, etapa, inicio, duracao) VALUES (?, ?, ?, ?, ?)", tempos
+                )
+                cursor = conn.executemany(f'''
+                    INSERT INTO pacientes (id_paciente, nome_paciente, status, data_verificacao)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(id_paciente) DO UPDATE SET
+                        nome_paciente = excluded.nome_paciente,
+                        status = excluded.status,
+                        data_verificacao = excluded.data_verificacao
+                    WHERE pacientes.status = '{STATUS_REPROCESSAR}'
+                ''', registros)
+            ignorados = len(registros) - cursor.rowcount
+            if registros and ignorados > 0:
+                print(f"{ignorados} ID(s) do lote já existiam no banco. Inserções duplicadas ignoradas.")
+        except Exception as e:
+            print(f"Erro ao gravar lote de {len(registros)} registros: {e}")
+            for registro in registros:
+                _pendentes.setdefault(registro[0], registro)
+            for id_paciente, data in amostras:
+                _amostras_pendentes.setdefault(id_paciente, data)
+            _tempos_pendentes[:0] = tempos
+
+def _flush_se_necessario():
+    """
+    Dispara o flush quando o buffer atinge o tamanho do lote ou o intervalo máximo.
+    """
+    if len(_pendentes) >= TAMANHO_LOTE or time.monotonic() - _ultimo_flush >= INTERVALO_FLUSH:
+        flush_registros()
 
 def verificar_id_existente(id_paciente):
     """
-    Verifica se um ID de paciente já existe no banco de dados.
+    Verifica se um ID de paciente já foi verificado (no banco de dados ou no buffer de escrita).
+    IDs com status 'erro_geral' não contam como verificados.
     Retorna True se existir, False caso contrário.
     """
+    if id_paciente in _pendentes:
+        return _pendentes[id_paciente][2] != STATUS_REPROCESSAR
+    if _indice_verificados is not None:
+        return _indice_verificados.contem(id_paciente)
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM pacientes WHERE id_paciente = ?", (id_paciente,))
+        cursor = obter_conexao().execute(
+            "SELECT 1 FROM pacientes WHERE id_paciente = ? AND status != ?", (id_paciente, STATUS_REPROCESSAR)
+        )
         resultado = cursor.fetchone()
         return resultado is not None
     except Exception as e:
         print(f"Erro ao verificar ID {id_paciente}: {e}")
-        return False 
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+        return False
 
 def registrar_paciente(id_paciente, status, nome_paciente=None):
     """
     Registra o resultado do scraping para um determinado ID de paciente.
+    O registro entra no buffer de escrita e é gravado em lote (por quantidade ou tempo).
+    Um registro 'erro_geral' existente é substituído quando o ID é reprocessado.
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        data_atual = datetime.now()
-        cursor.execute('''
-            INSERT INTO pacientes (id_paciente, nome_paciente, status, data_verificacao)
-            VALUES (?, ?, ?, ?)
-        ''', (id_paciente, nome_paciente, status, data_atual))
-        conn.commit()
-        print(f"ID {id_paciente} registrado com status '{status}'.")
-    except sqlite3.IntegrityError:
-        print(f"ID {id_paciente} já existe no banco. Ignorando inserção duplicada.")
+        with _lock_pendentes:
+            if id_paciente in _pendentes and _pendentes[id_paciente][2] != STATUS_REPROCESSAR:
+                print(f"ID {id_paciente} já existe no banco. Ignorando inserção duplicada.")
+                return
+            _pendentes[id_paciente] = (id_paciente, nome_paciente, status, datetime.now())
+            if _indice_verificados is not None and status != STATUS_REPROCESSAR:
+                _indice_verificados.adicionar(id_paciente)
+            print(f"ID {id_paciente} registrado com status '{status}'.")
+            _flush_se_necessario()
     except Exception as e:
         print(f"Erro ao registrar paciente com ID {id_paciente}: {e}")
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+
+def registrar_amostra_data(id_paciente, data_referencia):
+    """
+    Acrescenta ao índice ID -> data (cadastro/atendimento) a data lida na página do paciente.
+    A amostra entra no buffer de escrita e é gravada junto com o próximo lote de pacientes.
+    """
+    try:
+        with _lock_pendentes:
+            _amostras_pendentes[id_paciente] = data_referencia.isoformat()
+            _flush_se_necessario()
+    except Exception as e:
+        print(f"Erro ao registrar data do paciente com ID {id_paciente}: {e}")
+
+def obter_amostras_datas():
+    """
+    Retorna o índice de amostras como lista de (id_paciente, date) ordenada por ID.
+    """
+    flush_registros()
+    try:
+        cursor = obter_conexao().execute(
+            "SELECT id_paciente, data_referencia FROM amostras_datas ORDER BY id_paciente"
+        )
+        return [(id_paciente, date.fromisoformat(data)) for id_paciente, data in cursor.fetchall()]
+    except Exception as e:
+        print(f"Erro ao obter amostras de datas: {e}")
+        return []
+
+def registrar_tempo(run_id, etapa, id_paciente, inicio, duracao):
+    """
+    Registra a duração (segundos) de uma etapa do processamento de um paciente na execução run_id.
+    O registro entra no buffer de escrita e é gravado junto com o próximo lote de pacientes.
+    """
+    try:
+        with _lock_pendentes:
+            _tempos_pendentes.append((run_id, id_paciente, etapa, inicio.strftime("%Y-%m-%d %H:%M:%S.%f"), duracao))
+    except Exception as e:
+        print(f"Erro ao registrar tempo da etapa '{etapa}' do paciente com ID {id_paciente}: {e}")
+
+def _percentil(valores, percentil):
+    """
+    Percentil pelo método do posto mais próximo sobre uma lista já ordenada (None se vazia).
+    """
+    if not valores:
+        return None
+    posicao = max(0, math.ceil(percentil / 100 * len(valores)) - 1)
+    return valores[posicao]
+
+def percentis_tempos(run_id):
+    """
+    Calcula, para cada etapa da execução run_id, a quantidade de medições, o tempo total e
+    os percentis p50, p95 e p99 (segundos). Retorna uma lista de dicionários ordenada pelo tempo total.
+    """
+    flush_registros()
+    try:
+        cursor = obter_conexao().execute(
+            "SELECT etapa, duracao FROM timings WHERE run_id = ? ORDER BY etapa, duracao", (run_id,)
+        )
+        duracoes = {}
+        for etapa, duracao in cursor.fetchall():
+            duracoes.setdefault(etapa, []).append(duracao)
+        estatisticas = [
+            {
+                "etapa": etapa,
+                "amostras": len(valores),
+                "total": sum(valores),
+                "p50": _percentil(valores, 50),
+                "p95": _percentil(valores, 95),
+                "p99": _percentil(valores, 99),
+            }
+            for etapa, valores in duracoes.items()
+        ]
+        return sorted(estatisticas, key=lambda estatistica: estatistica["total"], reverse=True)
+    except Exception as e:
+        print(f"Erro ao calcular os tempos da execução {run_id}: {e}")
+        return []
 
 def obter_maior_id_verificado():
     """
@@ -73,17 +293,13 @@ def obter_maior_id_verificado():
     Retorna o ID (int) ou None se o banco estiver vazio.
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT MAX(id_paciente) FROM pacientes")
+        flush_registros()
+        cursor = obter_conexao().execute("SELECT MAX(id_paciente) FROM pacientes")
         resultado = cursor.fetchone()
         return resultado[0] if resultado and resultado[0] is not None else None
     except Exception as e:
         print(f"Erro ao obter o maior ID verificado: {e}")
         return None
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
 
 def obter_menor_id_verificado(id_base):
     """
@@ -91,14 +307,241 @@ def obter_menor_id_verificado(id_base):
     Retorna o ID (int) ou None se não houver nenhum.
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT MIN(id_paciente) FROM pacientes WHERE id_paciente < ?", (id_base,))
+        flush_registros()
+        cursor = obter_conexao().execute("SELECT MIN(id_paciente) FROM pacientes WHERE id_paciente < ?", (id_base,))
         resultado = cursor.fetchone()
         return resultado[0] if resultado and resultado[0] is not None else None
     except Exception as e:
         print(f"Erro ao obter o menor ID verificado: {e}")
         return None
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+
+def carregar_indice_verificados():
+    """
+    Carrega os IDs já registrados como intervalos contíguos (agregados no próprio SQLite).
+    A partir daí verificar_id_existente e proximo_id_nao_verificado são respondidos em memória.
+    """
+    global _indice_verificados
+    try:
+        flush_registros()
+        cursor = obter_conexao().execute('''
+            SELECT MIN(id_paciente), MAX(id_paciente) FROM (
+                SELECT id_paciente, id_paciente - ROW_NUMBER() OVER (ORDER BY id_paciente) AS grupo
+                FROM pacientes WHERE status != ?
+            ) GROUP BY grupo ORDER BY 1
+        ''', (STATUS_REPROCESSAR,))
+        _indice_verificados = IndiceIntervalos(cursor.fetchall())
+        print(f"Índice de IDs verificados carregado: {len(_indice_verificados)} intervalo(s).")
+    except Exception as e:
+        print(f"Erro ao carregar índice de IDs verificados: {e}")
+        _indice_verificados = None
+    return _indice_verificados
+
+def proximo_id_nao_verificado(id_paciente, direcao):
+    """
+    Retorna o primeiro ID a partir de id_paciente (inclusive), no sentido 'para_cima' ou 'para_baixo',
+    que ainda não foi verificado, saltando trechos inteiros já registrados.
+    """
+    if _indice_verificados is None:
+        carregar_indice_verificados()
+    if _indice_verificados is None:
+        incremento = 1 if direcao == 'para_cima' else -1
+        while verificar_id_existente(id_paciente):
+            id_paciente += incremento
+        return id_paciente
+    return _indice_verificados.proximo_fora(id_paciente, direcao)
+
+def registrar_faixa_varrida(inicio, fim):
+    """
+    Marca a faixa [inicio, fim] como completamente varrida, fundindo-a com as faixas
+    sobrepostas ou adjacentes já gravadas. Os registros pendentes são gravados antes,
+    para que uma faixa nunca cubra IDs que ainda não estão no banco.
+    """
+    if inicio > fim:
+        inicio, fim = fim, inicio
+    try:
+        flush_registros()
+        conn = obter_conexao()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            vizinhas = conn.execute(
+                "SELECT rowid, inicio, fim FROM faixas_varridas WHERE fim >= ? AND inicio <= ?",
+                (inicio - 1, fim + 1)
+            ).fetchall()
+            for _, inicio_vizinha, fim_vizinha in vizinhas:
+                inicio = min(inicio, inicio_vizinha)
+                fim = max(fim, fim_vizinha)
+            conn.executemany("DELETE FROM faixas_varridas WHERE rowid = ?", [(v[0],) for v in vizinhas])
+            conn.execute("INSERT INTO faixas_varridas (inicio, fim) VALUES (?, ?)", (inicio, fim))
+    except Exception as e:
+        print(f"Erro ao registrar faixa varrida [{inicio}, {fim}]: {e}")
+
+def obter_lacunas(id_minimo, id_maximo):
+    """
+    Retorna, em ordem crescente, a lista de intervalos (inicio, fim) dentro de [id_minimo, id_maximo]
+    que ainda não foram varridos. O custo é proporcional ao número de faixas, não de IDs.
+    """
+    if id_minimo > id_maximo:
+        return []
+    try:
+        flush_registros()
+        faixas = obter_conexao().execute(
+            "SELECT inicio, fim FROM faixas_varridas WHERE fim >= ? AND inicio <= ? ORDER BY inicio",
+            (id_minimo, id_maximo)
+        ).fetchall()
+    except Exception as e:
+        print(f"Erro ao obter lacunas entre {id_minimo} e {id_maximo}: {e}")
+        return [(id_minimo, id_maximo)]
+
+    lacunas = []
+    proximo = id_minimo
+    for inicio, fim in faixas:
+        if inicio > proximo:
+            lacunas.append((proximo, inicio - 1))
+        proximo = max(proximo, fim + 1)
+    if proximo <= id_maximo:
+        lacunas.append((proximo, id_maximo))
+    return lacunas
+
+def registrar_fronteira(direcao, id_fronteira):
+    """
+    Grava o último ID populado encontrado na direção ('para_cima' ou 'para_baixo').
+    """
+    try:
+        conn = obter_conexao()
+        with conn:
+            conn.execute('''
+                INSERT INTO fronteiras (direcao, id_fronteira, data_registro) VALUES (?, ?, ?)
+                ON CONFLICT(direcao) DO UPDATE SET
+                    id_fronteira = excluded.id_fronteira,
+                    data_registro = excluded.data_registro
+            ''', (direcao, id_fronteira, datetime.now()))
+        print(f"Fronteira '{direcao}' registrada no ID {id_fronteira}.")
+    except Exception as e:
+        print(f"Erro ao registrar fronteira '{direcao}': {e}")
+
+def obter_fronteira(direcao):
+    """
+    Retorna o último ID populado registrado para a direção, ou None.
+    """
+    try:
+        resultado = obter_conexao().execute(
+            "SELECT id_fronteira FROM fronteiras WHERE direcao = ?", (direcao,)
+        ).fetchone()
+        return resultado[0] if resultado else None
+    except Exception as e:
+        print(f"Erro ao obter fronteira '{direcao}': {e}")
+        return None
+
+def criar_lotes_trabalho(id_minimo, id_maximo, tamanho_lote):
+    """
+    Cria (se ainda não existirem) os lotes de trabalho que dividem [id_minimo, id_maximo].
+    É idempotente: vários contêineres podem chamá-la ao mesmo tempo com a mesma configuração.
+    """
+    lotes = [
+        (inicio, min(inicio + tamanho_lote - 1, id_maximo))
+        for inicio in range(id_minimo, id_maximo + 1, tamanho_lote)
+    ]
+    try:
+        conn = obter_conexao()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO lotes_trabalho (inicio, fim) VALUES (?, ?)", lotes)
+    except Exception as e:
+        print(f"Erro ao criar lotes de trabalho: {e}")
+
+def reivindicar_lote(dono, duracao_lease, id_base, max_tentativas=3):
+    """
+    Reserva atomicamente o próximo lote livre (pendente ou com lease expirado), priorizando
+    os lotes mais próximos do ID base. Retorna (inicio, fim) ou None se não houver lote disponível.
+    Lotes livres que já foram reservados max_tentativas vezes são marcados como 'falhou'
+    em vez de reservados de novo.
+    """
+    agora = time.time()
+    try:
+        conn = obter_conexao()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            esgotados = conn.execute('''
+                UPDATE lotes_trabalho SET status = 'falhou', dono = NULL, expira_em = NULL
+                WHERE (status = 'pendente' OR (status = 'em_andamento' AND expira_em < ?))
+                  AND tentativas >= ?
+            ''', (agora, max_tentativas)).rowcount
+            lote = conn.execute('''
+                SELECT inicio, fim, status, dono FROM lotes_trabalho
+                WHERE status = 'pendente' OR (status = 'em_andamento' AND expira_em < ?)
+                ORDER BY MIN(ABS(inicio - ?), ABS(fim - ?))
+                LIMIT 1
+            ''', (agora, id_base, id_base)).fetchone()
+            if lote is not None:
+                inicio, fim, status, dono_anterior = lote
+                conn.execute('''
+                    UPDATE lotes_trabalho
+                    SET status = 'em_andamento', dono = ?, expira_em = ?, heartbeat = ?, tentativas = tentativas + 1
+                    WHERE inicio = ?
+                ''', (dono, agora + duracao_lease, agora, inicio))
+        if esgotados:
+            print(f"{esgotados} lote(s) marcado(s) como 'falhou' após {max_tentativas} tentativa(s).")
+        if lote is None:
+            return None
+        if status == 'em_andamento':
+            print(f"Lease expirado de '{dono_anterior}' no lote {inicio} a {fim} foi recuperado.")
+        return inicio, fim
+    except Exception as e:
+        print(f"Erro ao reivindicar lote de trabalho: {e}")
+        return None
+
+def renovar_lote(inicio, dono, duracao_lease):
+    """
+    Renova o lease (heartbeat) de um lote. Retorna False se o lote não pertence mais ao dono.
+    """
+    agora = time.time()
+    try:
+        conn = obter_conexao()
+        with conn:
+            cursor = conn.execute('''
+                UPDATE lotes_trabalho SET expira_em = ?, heartbeat = ?
+                WHERE inicio = ? AND dono = ? AND status = 'em_andamento'
+            ''', (agora + duracao_lease, agora, inicio, dono))
+        return cursor.rowcount == 1
+    except Exception as e:
+        print(f"Erro ao renovar lease do lote {inicio}: {e}")
+        return True
+
+def finalizar_lote(inicio, dono, concluido=True, max_tentativas=3, contar_tentativa=True):
+    """
+    Marca o lote como concluído ou, em caso de falha, o devolve à fila como pendente; com
+    max_tentativas reservas já feitas, o lote é marcado como 'falhou' e não volta à fila.
+    Sem contar_tentativa (ex.: reciclagem planejada do navegador), a reserva não conta como tentativa.
+    Retorna o status final do lote, ou None em caso de erro.
+    """
+    try:
+        flush_registros()
+        conn = obter_conexao()
+        with conn:
+            if not concluido and not contar_tentativa:
+                conn.execute(
+                    "UPDATE lotes_trabalho SET tentativas = MAX(tentativas - 1, 0) WHERE inicio = ? AND dono = ?",
+                    (inicio, dono)
+                )
+            conn.execute('''
+                UPDATE lotes_trabalho
+                SET status = CASE WHEN ? THEN 'concluido' WHEN tentativas >= ? THEN 'falhou' ELSE 'pendente' END,
+                    dono = NULL, expira_em = NULL
+                WHERE inicio = ? AND dono = ?
+            ''', (concluido, max_tentativas, inicio, dono))
+            resultado = conn.execute("SELECT status FROM lotes_trabalho WHERE inicio = ?", (inicio,)).fetchone()
+        return resultado[0] if resultado else None
+    except Exception as e:
+        print(f"Erro ao finalizar lote {inicio}: {e}")
+        return None
+
+def fechar_banco():
+    """
+    Grava os registros pendentes e fecha a conexão da thread atual.
+    """
+    flush_registros()
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "pid", None) == os.getpid():
+        conn.close()
+    _local.conn = None
+
+atexit.register(flush_registros)
@@ -0,0 +1,62 @@
+from bisect import bisect_right
+
+class IndiceIntervalos:
+    """
+    Conjunto de IDs inteiros armazenado como intervalos fechados [inicio, fim] ordenados e disjuntos.
+    O uso de memória é proporcional ao número de intervalos, não ao número de IDs.
+    """
+
+    def __init__(self, intervalos=None):
+        self.inicios: list[int] = []
+        self.fins: list[int] = []
+        for inicio, fim in sorted(intervalos or []):
+            self.adicionar_intervalo(inicio, fim)
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def _posicao(self, id_valor):
+        """
+        Retorna o índice do intervalo que contém o ID, ou None.
+        """
+        i = bisect_right(self.inicios, id_valor) - 1
+        if i >= 0 and self.fins[i] >= id_valor:
+            return i
+        return None
+
+    def contem(self, id_valor):
+        return self._posicao(id_valor) is not None
+
+    def adicionar(self, id_valor):
+        self.adicionar_intervalo(id_valor, id_valor)
+
+    def adicionar_intervalo(self, inicio, fim):
+        """
+        Insere o intervalo [inicio, fim], fundindo-o com vizinhos sobrepostos ou adjacentes.
+        """
+        if inicio > fim:
+            inicio, fim = fim, inicio
+        # Primeiro intervalo que pode tocar [inicio, fim] (fim >= inicio - 1)
+        i = bisect_right(self.inicios, inicio) - 1
+        if i < 0 or self.fins[i] < inicio - 1:
+            i += 1
+        j = i
+        while j < len(self.inicios) and self.inicios[j] <= fim + 1:
+            inicio = min(inicio, self.inicios[j])
+            fim = max(fim, self.fins[j])
+            j += 1
+        self.inicios[i:j] = [inicio]
+        self.fins[i:j] = [fim]
+
+    def proximo_fora(self, id_valor, direcao):
+        """
+        Retorna o primeiro ID a partir de id_valor (inclusive), no sentido indicado,
+        que não pertence ao índice. Salta intervalos inteiros em O(log n).
+        """
+        i = self._posicao(id_valor)
+        if i is None:
+            return id_valor
+        return self.fins[i] + 1 if direcao == 'para_cima' else self.inicios[i] - 1
+
+    def intervalos(self):
+        return list(zip(self.inicios, self.fins))
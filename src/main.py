@@ -1,51 +1,97 @@
-from browser import Browser
-from scraper import Scraper
+import os
+from datetime import datetime
+from supervisor import Supervisor
+from browser import limpar_perfis_orfaos
+from utils.config import obter_secao
 import database
+import pool
+import seletores
 
-def execute_scraping():
+# Navegador mantido aberto entre execuções do modo agendado (schedule.keep_browser_warm)
+_navegador_aquecido = None
+
+def execute_scraping(manter_navegador=False, janela_datas=None):
     """
     Função principal que encapsula todo o processo de scraping.
-    Retorna um dicionário com o resumo da execução.
+    Com manter_navegador, o navegador fica aberto ao final e é reaproveitado pela próxima chamada.
+    janela_datas (data_inicio, data_fim) restringe a varredura aos IDs cadastrados nesse período.
+    Retorna um dicionário com o resumo da execução, incluindo os percentis de tempo por etapa ('timings').
     """
+    global _navegador_aquecido
     database.inicializar_banco()
-    browser = Browser()
+    limpar_perfis_orfaos()
     
     summary = {
+        "run_id": f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}",
         "captured": [],
         "errors": []
     }
 
+    if janela_datas and not seletores.grupo("pagina").get("campo_data"):
+        # Sem o campo de data não há como delimitar a janela: varre tudo, como o modo 'all'
+        aviso = (
+            "Janela de datas ignorada: configure 'pagina.campo_data' em seletores.yaml com o id do campo "
+            "que traz a data de cadastro/atendimento do paciente. Varrendo a faixa completa."
+        )
+        print(aviso)
+        summary["errors"].append(aviso)
+        janela_datas = None
+
+    workers = int(obter_secao("workers").get("count", 1))
+    if workers > 1 and janela_datas:
+        print("Janela de datas não é suportada com vários workers; usando um único navegador.")
+    elif workers > 1:
+        try:
+            pool.executar_pool(workers, summary)
+        finally:
+            registrar_tempos_etapas(summary)
+            database.fechar_banco()
+        return summary
+
+    supervisor = Supervisor(summary, browser=_navegador_aquecido, manter_aberto=manter_navegador, janela_datas=janela_datas)
+    _navegador_aquecido = None
+
     try:
-        browser.open_browser()
-        if browser.errors:
-            summary["errors"].extend(browser.errors)
-            raise Exception("Erro na inicialização do navegador.")
-
-        browser.login()
-        if browser.errors:
-            summary["errors"].extend(browser.errors)
-            raise Exception("Erro durante o login.")
-        
-        browser.ready_for_scraping()
-        if browser.errors:
-            summary["errors"].extend(browser.errors)
-            raise Exception("Erro durante a preparação para scraping.")
-        
-        scraper = Scraper(browser.driver)
-        scraper.iniciar_scraping()
+        supervisor.executar()
         
     except Exception as e:
         error_msg = f"Ocorreu um erro crítico no fluxo principal: {e}"
         print(error_msg)
         summary["errors"].append(error_msg)
-        if browser.errors:
-            summary["errors"].extend(browser.errors)
             
     finally:
-        print("Processo finalizado. Fechando o navegador.")
-        browser.fechar_navegador()
+        if supervisor.reinicios:
+            print(f"Navegador reiniciado {supervisor.reinicios} vez(es); {supervisor.tempo_parado:.0f}s sem processar.")
+        if supervisor.reciclagens:
+            print(f"Navegador reciclado {supervisor.reciclagens} vez(es) por limite de memória ou de pacientes.")
+        for linha in seletores.relatorio_tempos():
+            print(f"Tempo por seletor - {linha}")
+        registrar_tempos_etapas(summary)
+        _navegador_aquecido = supervisor.browser if manter_navegador else None
+        print("Processo finalizado." if _navegador_aquecido is None else "Processo finalizado. Navegador mantido aberto.")
+        database.fechar_banco()
 
     return summary
 
+def registrar_tempos_etapas(summary):
+    """
+    Calcula os percentis de tempo por etapa da execução, guarda-os em summary['timings'] e os exibe.
+    """
+    summary["timings"] = database.percentis_tempos(summary["run_id"])
+    for etapa in summary["timings"]:
+        print(
+            f"Tempo por etapa - {etapa['etapa']}: {etapa['amostras']} medição(ões), "
+            f"p50 {etapa['p50']:.2f}s, p95 {etapa['p95']:.2f}s, p99 {etapa['p99']:.2f}s"
+        )
+
+def fechar_navegador_aquecido():
+    """
+    Fecha o navegador mantido aberto entre execuções, se houver.
+    """
+    global _navegador_aquecido
+    if _navegador_aquecido is not None:
+        _navegador_aquecido.fechar_navegador()
+        _navegador_aquecido = None
+
 if __name__ == "__main__":
-    execute_scraping()
\ No newline at end of file
+    execute_scraping()
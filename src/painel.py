@@ -0,0 +1,259 @@
+import time
+import logging
+from selenium.common.exceptions import NoAlertPresentException
+import seletores
+
+logger = logging.getLogger(__name__)
+
+TEXTO_PACIENTE_NAO_ENCONTRADO = "Paciente não encontrado no Vöiston"
+
+# Função JS que lê o painel inteiro de uma vez a partir do Shadow Root.
+# É compartilhada pelos scripts de snapshot, espera e clique.
+_JS_CAPTURAR = """
+function capturarPainel(hostId, sel, textoNaoEncontrado) {
+    const host = document.getElementById(hostId);
+    const root = host ? host.shadowRoot : null;
+    const estado = {
+        host_presente: !!root, paciente_encontrado: false, paciente_nao_encontrado: false,
+        texto_status: null, novos_exames: null, exames_voiston: null,
+        botao_importar: false, texto_botao: null, progresso: null, login_extensao: false,
+        nome_painel: null
+    };
+    if (!root) return estado;
+    const texto = (s) => { const e = root.querySelector(s); return e ? e.innerText.trim() : null; };
+    const numero = (t) => (t !== null && /^\\d+$/.test(t)) ? parseInt(t, 10) : null;
+    estado.texto_status = texto(sel.status_paciente);
+    estado.paciente_nao_encontrado = estado.texto_status === textoNaoEncontrado;
+    estado.nome_painel = texto(sel.nome_paciente);
+    estado.paciente_encontrado = estado.nome_painel !== null;
+    estado.login_extensao = !!root.querySelector(sel.link_entrar);
+    estado.novos_exames = numero(texto(sel.contagem_novos));
+    estado.exames_voiston = numero(texto(sel.contagem_voiston));
+    estado.texto_botao = texto(sel.botao_importar);
+    estado.botao_importar = estado.texto_botao !== null;
+    if (estado.texto_botao !== null) estado.progresso = numero(estado.texto_botao.replace(/%$/, ''));
+    return estado;
+}
+"""
+
+_SCRIPT_SNAPSHOT = _JS_CAPTURAR + """
+return capturarPainel(arguments[0], arguments[1], arguments[2]);
+"""
+
+_SCRIPT_CLICAR = """
+const host = document.getElementById(arguments[0]);
+const botao = host && host.shadowRoot ? host.shadowRoot.querySelector(arguments[1]) : null;
+if (!botao) return false;
+botao.click();
+return true;
+"""
+
+# Procura o botão de confirmação em um diálogo do Shadow Root da extensão ou do documento
+# e clica nele. Retorna o texto do botão clicado ou null.
+_SCRIPT_CONFIRMAR = """
+const [hostId, container, textos] = arguments;
+const host = document.getElementById(hostId);
+const raizes = [host && host.shadowRoot, document].filter(Boolean);
+const aceitos = textos.map((t) => t.trim().toLowerCase());
+for (const raiz of raizes) {
+    for (const dialogo of raiz.querySelectorAll(container)) {
+        for (const botao of dialogo.querySelectorAll('button, [role="button"]')) {
+            const texto = (botao.innerText || '').trim();
+            if (botao.offsetParent !== null && aceitos.includes(texto.toLowerCase())) {
+                botao.click();
+                return texto;
+            }
+        }
+    }
+}
+return null;
+"""
+
+# Script assíncrono: resolve com o snapshot do painel assim que uma das condições pedidas
+# for satisfeita, observando mutações do Shadow DOM em vez de consultar em intervalos fixos.
+# No timeout resolve com o snapshot atual e 'condicao' nula.
+_SCRIPT_AGUARDAR = _JS_CAPTURAR + """
+const [hostId, condicoes, sel, textoNaoEncontrado, timeoutMs, nomeEsperado, concluir] = arguments;
+const normalizar = (t) => (t || '').normalize('NFD').replace(/[\\u0300-\\u036f]/g, '').replace(/\\s+/g, ' ').trim().toUpperCase();
+const mesmoNome = (a, b) => {
+    const [x, y] = [normalizar(a), normalizar(b)];
+    return !!x && x === y;
+};
+// Algum elemento folha do painel exibe exatamente o nome esperado
+function painelCitaNome() {
+    const host = document.getElementById(hostId);
+    const root = host ? host.shadowRoot : null;
+    if (!root || !nomeEsperado) return false;
+    return Array.from(root.querySelectorAll('*')).some(
+        (el) => el.children.length === 0 && mesmoNome(el.textContent, nomeEsperado)
+    );
+}
+const regras = {
+    contagem_novos: (e) => e.novos_exames !== null,
+    contagem_voiston: (e) => e.exames_voiston !== null,
+    botao_importar: (e) => e.botao_importar,
+    progresso_completo: (e) => !e.botao_importar || (e.progresso !== null && e.progresso >= 100),
+    paciente_nao_encontrado: (e) => e.paciente_nao_encontrado,
+    paciente_encontrado: (e) => e.paciente_encontrado,
+    login_extensao: (e) => e.login_extensao,
+    paciente_atual: (e) => (e.nome_painel !== null && mesmoNome(e.nome_painel, nomeEsperado))
+        || (e.paciente_nao_encontrado && painelCitaNome()),
+};
+
+let observador = null;
+let finalizado = false;
+let limite = null;
+function finalizar(estado, condicao) {
+    if (finalizado) return;
+    finalizado = true;
+    if (observador) observador.disconnect();
+    clearTimeout(limite);
+    estado.condicao = condicao;
+    concluir(estado);
+}
+function verificar() {
+    const estado = capturarPainel(hostId, sel, textoNaoEncontrado);
+    if (!estado.host_presente) return;
+    const condicao = condicoes.find((nome) => regras[nome] && regras[nome](estado));
+    if (condicao) finalizar(estado, condicao);
+}
+limite = setTimeout(() => finalizar(capturarPainel(hostId, sel, textoNaoEncontrado), null), timeoutMs);
+
+verificar();
+if (!finalizado) {
+    const host = document.getElementById(hostId);
+    // Sem o host, observa o documento até a extensão injetar o painel
+    const alvo = host && host.shadowRoot ? host.shadowRoot : document.documentElement;
+    observador = new MutationObserver(() => {
+        verificar();
+        const h = document.getElementById(hostId);
+        if (!finalizado && alvo === document.documentElement && h && h.shadowRoot) {
+            observador.disconnect();
+            observador.observe(h.shadowRoot, {subtree: true, childList: true, characterData: true, attributes: true});
+        }
+    });
+    observador.observe(alvo, {subtree: true, childList: true, characterData: true, attributes: true});
+}
+"""
+
+def capturar_estado(driver):
+    """
+    Lê todo o estado do painel da extensão em uma única chamada ao WebDriver.
+
+    Retorno:
+    - dict com 'host_presente', 'paciente_encontrado', 'paciente_nao_encontrado', 'texto_status',
+      'novos_exames', 'exames_voiston', 'botao_importar', 'texto_botao', 'progresso'
+      (números como int ou None), 'login_extensao' (link de login visível) e 'nome_painel' (nome
+      exibido pela extensão), ou None em caso de erro.
+    """
+    try:
+        with seletores.medir("painel.snapshot"):
+            return driver.execute_script(
+                _SCRIPT_SNAPSHOT, seletores.seletor("extensao", "host"), seletores.grupo("painel"),
+                TEXTO_PACIENTE_NAO_ENCONTRADO
+            )
+    except Exception as e:
+        logger.warning(f"Erro ao capturar estado do painel: {e}")
+        return None
+
+def aguardar_estado(driver, condicoes, timeout=15, nome_esperado=None):
+    """
+    Aguarda, sem polling, até que uma das condições do painel da extensão seja verdadeira.
+
+    Parâmetros:
+    - driver (WebDriver): Instância do Selenium WebDriver (no conteúdo principal da página).
+    - condicoes (list[str]): Nomes das condições, em ordem de prioridade: 'contagem_novos',
+      'contagem_voiston', 'botao_importar', 'progresso_completo', 'paciente_nao_encontrado',
+      'paciente_encontrado', 'login_extensao' e 'paciente_atual' (painel já recarregado para o
+      paciente nome_esperado: exibe exatamente esse nome, ou exibe o nome e a mensagem de que
+      ele não existe na Vöiston).
+    - timeout (float): Tempo máximo de espera em segundos.
+    - nome_esperado (str): Nome do paciente da página, usado pela condição 'paciente_atual'.
+
+    Retorno:
+    - Snapshot do painel (ver capturar_estado) com a chave 'condicao' indicando a condição
+      satisfeita ('condicao' None se o tempo limite foi atingido), ou None em caso de erro.
+    """
+    if isinstance(condicoes, str):
+        condicoes = [condicoes]
+    try:
+        with seletores.medir(f"painel.aguardar[{','.join(condicoes)}]"):
+            return driver.execute_async_script(
+                _SCRIPT_AGUARDAR, seletores.seletor("extensao", "host"), list(condicoes),
+                seletores.grupo("painel"), TEXTO_PACIENTE_NAO_ENCONTRADO, int(timeout * 1000), nome_esperado
+            )
+    except Exception as e:
+        logger.warning(f"Erro ao aguardar estado {condicoes} do painel: {e}")
+        return None
+
+def clicar_importar(driver):
+    """
+    Clica no botão de envio/importação do painel. Retorna False se o botão não existir.
+    """
+    try:
+        with seletores.medir("painel.clicar_importar"):
+            return bool(driver.execute_script(
+                _SCRIPT_CLICAR, seletores.seletor("extensao", "host"), seletores.seletor("painel", "botao_importar")
+            ))
+    except Exception as e:
+        logger.warning(f"Erro ao clicar no botão de importação: {e}")
+        return False
+
+def _aceitar_alerta(driver):
+    """
+    Aceita um alert/confirm nativo aberto na aba. Retorna False se não houver nenhum.
+    """
+    try:
+        driver.switch_to.alert.accept()
+        return True
+    except NoAlertPresentException:
+        return False
+
+def _aceitar_via_cdp(driver):
+    """
+    Aceita um diálogo JavaScript pelo Page.handleJavaScriptDialog (CDP). Retorna False se não
+    houver diálogo aberto ou se o driver não suportar CDP.
+    """
+    try:
+        driver.execute_cdp_cmd("Page.handleJavaScriptDialog", {"accept": True})
+        return True
+    except Exception:
+        return False
+
+def confirmar_dialogo(driver, timeout=2, intervalo=0.1):
+    """
+    Confirma o diálogo exibido após clicar no botão de importação, sem depender da tela.
+
+    Tenta, a cada intervalo e na mesma espera curta: um alert/confirm nativo (WebDriver), um
+    botão de confirmação dentro de um diálogo do DOM (grupo 'dialogo' do registro de seletores)
+    e o Page.handleJavaScriptDialog via CDP. Se o painel já mostrar o progresso da importação,
+    o diálogo foi aceito por outro meio (ex.: unhandled_prompt_behavior) e não há o que confirmar.
+
+    Retorno:
+    - 'alerta', 'dom', 'cdp' ou 'painel' conforme o meio usado, ou None se a importação não foi
+      confirmada dentro do tempo limite.
+    """
+    dialogo = seletores.grupo("dialogo")
+    argumentos = (
+        seletores.seletor("extensao", "host"),
+        seletores.seletor("dialogo", "container"),
+        list(dialogo.get("textos_confirmacao") or ["OK"]),
+    )
+    limite = time.monotonic() + timeout
+    with seletores.medir("painel.confirmar_dialogo"):
+        while True:
+            try:
+                if _aceitar_alerta(driver):
+                    return "alerta"
+                if driver.execute_script(_SCRIPT_CONFIRMAR, *argumentos):
+                    return "dom"
+            except Exception as e:
+                logger.warning(f"Erro ao procurar o diálogo de confirmação: {e}")
+            if _aceitar_via_cdp(driver):
+                return "cdp"
+            estado = capturar_estado(driver)
+            if estado and estado["progresso"] is not None:
+                return "painel"
+            if time.monotonic() >= limite:
+                return None
+            time.sleep(intervalo)
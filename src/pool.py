@@ -0,0 +1,233 @@
+import os
+import queue
+import multiprocessing
+import logging
+from utils.config import obter_secao
+import database
+
+logger = logging.getLogger(__name__)
+
+def dividir_em_lotes(lacunas, tamanho_lote, id_base):
+    """
+    Divide as lacunas (inicio, fim) em lotes de até tamanho_lote IDs.
+    Os lotes mais próximos do ID base são entregues primeiro, como na varredura serial.
+    """
+    lotes = []
+    for inicio, fim in lacunas:
+        atual = inicio
+        while atual <= fim:
+            lotes.append((atual, min(atual + tamanho_lote - 1, fim)))
+            atual += tamanho_lote
+    lotes.sort(key=lambda lote: min(abs(lote[0] - id_base), abs(lote[1] - id_base)))
+    return lotes
+
+def _abrir_sessao(numero, run_id=None):
+    """
+    Cria um navegador com login no portal e na extensão e o scraper associado.
+    Com perfil persistente, cada worker usa o seu próprio diretório (o Chrome trava o perfil).
+    """
+    from browser import Browser
+    from scraper import Scraper
+
+    diretorio_perfil = obter_secao("browser").get("profile_dir")
+    browser = Browser(diretorio_perfil=f"{diretorio_perfil}-worker{numero}" if diretorio_perfil else None)
+    try:
+        browser.iniciar_sessao()
+    except Exception:
+        browser.fechar_navegador()
+        raise
+    scraper = Scraper(browser.driver, run_id=run_id)
+    scraper.ao_criar_aba = browser.aplicar_perfil_enxuto
+    return browser, scraper
+
+def _worker(numero, fila_lotes, fila_resultados, max_tentativas, run_id=None):
+    """
+    Processo de trabalho: mantém sua própria sessão do Chrome e consome lotes da fila
+    até receber None. Um lote com falha volta para a fila (até max_tentativas) e a
+    sessão do navegador é recriada antes do próximo lote. Cada lote roda sob o mesmo
+    watchdog de travamento do Supervisor (seção 'watchdog').
+    """
+    from scraper import ReciclarNavegador
+    from supervisor import vigiar_travamento
+    from contextlib import nullcontext
+
+    config_watchdog = obter_secao("watchdog")
+    vigiar = bool(config_watchdog.get("enabled", True))
+    prazo_travamento = float(config_watchdog.get("stall_seconds", 180))
+    intervalo_verificacao = float(config_watchdog.get("check_seconds", 5))
+
+    resumo = {"captured": [], "errors": []}
+    browser = scraper = None
+    database.inicializar_banco()
+
+    def coletar_resumo():
+        if scraper:
+            resumo["captured"].extend(scraper.captured)
+            resumo["errors"].extend(scraper.errors)
+            scraper.captured.clear()
+            scraper.errors.clear()
+
+    try:
+        while True:
+            lote = fila_lotes.get()
+            if lote is None:
+                break
+            inicio, fim, tentativas = lote
+            # Informa o dono do lote: se este processo morrer, o coordenador o devolve à fila
+            fila_resultados.put(("iniciado", numero, lote, None))
+            try:
+                if browser is None:
+                    print(f"[Worker {numero}] Abrindo sessão do navegador...")
+                    browser, scraper = _abrir_sessao(numero, run_id)
+                print(f"[Worker {numero}] Processando lote {inicio} a {fim}")
+                with (vigiar_travamento(browser, scraper, prazo_travamento, intervalo_verificacao)
+                      if vigiar else nullcontext()):
+                    scraper.varrer_faixa(inicio, fim)
+                fila_resultados.put(("concluido", numero, lote, None))
+            except ReciclarNavegador as e:
+                # Troca planejada do navegador: o lote volta à fila sem consumir tentativa
+                coletar_resumo()
+                browser.fechar_navegador()
+                browser = scraper = None
+                fila_lotes.put((inicio, fim, tentativas))
+                fila_resultados.put(("devolvido", numero, lote, f"[Worker {numero}] Navegador reciclado: {e}"))
+            except Exception as e:
+                msg = f"[Worker {numero}] Falha no lote {inicio} a {fim}: {e}"
+                logger.error(msg)
+                coletar_resumo()
+                if browser:
+                    resumo["errors"].extend(browser.errors)
+                    browser.fechar_navegador()
+                browser = scraper = None
+                if tentativas + 1 < max_tentativas:
+                    fila_lotes.put((inicio, fim, tentativas + 1))
+                    fila_resultados.put(("devolvido", numero, lote, msg))
+                else:
+                    resumo["errors"].append(msg)
+                    fila_resultados.put(("desistiu", numero, lote, msg))
+    finally:
+        coletar_resumo()
+        if browser:
+            browser.fechar_navegador()
+        database.fechar_banco()
+        fila_resultados.put(("resumo", numero, None, resumo))
+
+def executar_pool(workers, summary):
+    """
+    Divide o intervalo ID_MINIMO..ID_MAXIMO em lotes, distribui-os entre processos
+    (um Chrome por processo) e mescla os resumos de cada processo em summary.
+    """
+    config_pool = obter_secao("workers")
+    tamanho_lote = max(1, int(config_pool.get("chunk_size", 1000)))
+    max_tentativas = max(1, int(config_pool.get("max_attempts", 3)))
+    id_minimo = int(os.getenv('ID_MINIMO', '1'))
+    id_maximo = int(os.getenv('ID_MAXIMO', '999999'))
+    id_base = int(os.getenv('ID_BASE', id_minimo))
+
+    lotes = dividir_em_lotes(database.obter_lacunas(id_minimo, id_maximo), tamanho_lote, id_base)
+    if not lotes:
+        print(f"Faixa {id_minimo} a {id_maximo} já varrida por completo.")
+        return summary
+    print(f"Modo pool: {len(lotes)} lote(s) de até {tamanho_lote} IDs para {workers} worker(s).")
+
+    # 'spawn' evita herdar conexões SQLite e estado do Selenium do processo principal
+    contexto = multiprocessing.get_context("spawn")
+    fila_lotes = contexto.Queue()
+    fila_resultados = contexto.Queue()
+    for inicio, fim in lotes:
+        fila_lotes.put((inicio, fim, 0))
+
+    def iniciar_worker(numero):
+        processo = contexto.Process(
+            target=_worker, args=(numero, fila_lotes, fila_resultados, max_tentativas, summary.get("run_id")),
+            daemon=True
+        )
+        processo.start()
+        return processo
+
+    processos = {n: iniciar_worker(n) for n in range(1, workers + 1)}
+
+    pendentes = len(lotes)
+    resumos_recebidos = 0
+    # Lote em processamento por cada worker (número -> (inicio, fim, tentativas))
+    em_andamento = {}
+    # Limite de processos substitutos, para não recriar indefinidamente um worker que morre ao iniciar
+    substituicoes_restantes = workers * max_tentativas
+
+    def tratar(mensagem):
+        nonlocal pendentes, resumos_recebidos
+        tipo, numero, lote, dados = mensagem
+        if tipo == "iniciado":
+            em_andamento[numero] = lote
+            return
+        if tipo in ("concluido", "desistiu", "devolvido"):
+            em_andamento.pop(numero, None)
+        if tipo in ("concluido", "desistiu"):
+            pendentes -= 1
+        elif tipo == "devolvido":
+            print(f"{dados} Lote devolvido à fila.")
+        elif tipo == "resumo":
+            resumos_recebidos += 1
+            summary["captured"].extend(dados["captured"])
+            summary["errors"].extend(dados["errors"])
+
+    def recuperar_workers_mortos():
+        """
+        Devolve à fila o lote de um worker que morreu sem avisar (OOM, segfault) e o substitui
+        por um novo processo enquanto houver lotes pendentes.
+        """
+        nonlocal pendentes, substituicoes_restantes
+        for numero, processo in list(processos.items()):
+            if processo.is_alive():
+                continue
+            # Mensagens já enviadas pelo processo antes de morrer
+            while True:
+                try:
+                    tratar(fila_resultados.get_nowait())
+                except queue.Empty:
+                    break
+            lote = em_andamento.pop(numero, None)
+            if lote is not None:
+                inicio, fim, tentativas = lote
+                msg = f"[Worker {numero}] Processo encerrado (código {processo.exitcode}) durante o lote {inicio} a {fim}."
+                logger.error(msg)
+                if tentativas + 1 < max_tentativas:
+                    fila_lotes.put((inicio, fim, tentativas + 1))
+                    print(f"{msg} Lote devolvido à fila.")
+                else:
+                    summary["errors"].append(msg)
+                    pendentes -= 1
+            if pendentes > 0 and substituicoes_restantes > 0:
+                substituicoes_restantes -= 1
+                print(f"[Worker {numero}] Iniciando processo substituto.")
+                processos[numero] = iniciar_worker(numero)
+            else:
+                del processos[numero]
+
+    while pendentes > 0:
+        try:
+            tratar(fila_resultados.get(timeout=5))
+        except queue.Empty:
+            pass
+        recuperar_workers_mortos()
+        if pendentes > 0 and not processos:
+            msg = f"Todos os workers encerraram com {pendentes} lote(s) pendente(s)."
+            logger.error(msg)
+            summary["errors"].append(msg)
+            break
+
+    for _ in processos:
+        fila_lotes.put(None)
+
+    while resumos_recebidos < len(processos):
+        try:
+            tratar(fila_resultados.get(timeout=5))
+        except queue.Empty:
+            if not any(processo.is_alive() for processo in processos.values()):
+                break
+
+    for processo in processos.values():
+        processo.join(timeout=30)
+
+    print(f"Modo pool finalizado: {len(summary['captured'])} paciente(s) capturado(s).")
+    return summary
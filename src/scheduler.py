@@ -2,31 +2,117 @@ import yaml
 import time
 from datetime import datetime
 import logging
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
 import main
 from utils.render_email import render_summary_email
 from utils.email_brevo import send_via_brevo
+from utils.helpers import parse_date_safe
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_scraping_task():
+def formatar_duracao(segundos):
+    """
+    Formata uma duração em segundos como 'HH:MM:SS'.
+    """
+    hrs, rem = divmod(segundos, 3600)
+    mins, secs = divmod(rem, 60)
+    return f"{int(hrs):02d}:{int(mins):02d}:{int(secs):02d}"
+
+UNIDADES_INTERVALO = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def interpretar_intervalo(texto):
+    """
+    Converte um intervalo como '45s', '30m', '2h' ou '1d' em segundos.
+    Lança ValueError para formatos ou unidades desconhecidos.
+    """
+    texto = str(texto).strip().lower()
+    unidade = texto[-1:]
+    if unidade not in UNIDADES_INTERVALO or not texto[:-1].isdigit() or int(texto[:-1]) <= 0:
+        raise ValueError(f"Intervalo '{texto}' inválido. Use um número seguido de s, m, h ou d (ex.: 30m).")
+    return int(texto[:-1]) * UNIDADES_INTERVALO[unidade]
+
+def criar_gatilho(schedule_config):
+    """
+    Cria o gatilho do APScheduler a partir da seção 'schedule': uma expressão crontab em
+    'cron' ou, na ausência dela, uma taxa fixa em 'every'. 'jitter' (segundos) desloca
+    cada disparo aleatoriamente.
+    """
+    jitter = int(schedule_config.get("jitter", 0)) or None
+    cron = schedule_config.get("cron")
+    if cron:
+        campos = cron.split()
+        if len(campos) != 5:
+            raise ValueError(f"Expressão cron '{cron}' inválida: são esperados 5 campos.")
+        minuto, hora, dia, mes, dia_semana = campos
+        return CronTrigger(minute=minuto, hour=hora, day=dia, month=mes, day_of_week=dia_semana, jitter=jitter)
+    return IntervalTrigger(seconds=interpretar_intervalo(schedule_config.get("every", "24h")), jitter=jitter)
+
+def iniciar_agendador(schedule_config):
+    """
+    Executa run_scraping_task pelo APScheduler até o processo ser interrompido.
+    Os disparos seguem o relógio (a duração da execução não desloca o próximo), nunca
+    há duas execuções simultâneas e disparos perdidos durante uma execução longa são
+    agrupados em um só.
+    """
+    manter_navegador = bool(schedule_config.get("keep_browser_warm", True))
+    gatilho = criar_gatilho(schedule_config)
+    agendador = BlockingScheduler()
+
+    def avisar(evento):
+        if evento.code == EVENT_JOB_MAX_INSTANCES:
+            logging.warning("Disparo ignorado: a execução anterior ainda está em andamento.")
+        else:
+            logging.warning(f"Disparo de {evento.scheduled_run_time} perdido.")
+
+    agendador.add_listener(avisar, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+    agendador.add_job(
+        run_scraping_task, gatilho, kwargs={"manter_navegador": manter_navegador},
+        id="scraping", max_instances=1, coalesce=True,
+        misfire_grace_time=int(schedule_config.get("misfire_grace_time", 300)),
+        next_run_time=datetime.now(),
+    )
+    logging.info(f"Modo agendado ativado com o gatilho {gatilho}.")
+    try:
+        agendador.start()
+    except (KeyboardInterrupt, SystemExit):
+        logging.info("Agendador interrompido.")
+    finally:
+        main.fechar_navegador_aquecido()
+
+def janela_do_config(range_config):
+    """
+    Lê range.start e range.end como uma janela de datas (data_inicio, data_fim),
+    aceitando as duas datas em qualquer ordem. Retorna None se alguma for inválida.
+    """
+    inicio = parse_date_safe(str(range_config.get("start", "")))
+    fim = parse_date_safe(str(range_config.get("end", "")))
+    if inicio is None or fim is None:
+        return None
+    return (min(inicio, fim), max(inicio, fim))
+
+def run_scraping_task(manter_navegador=False, janela_datas=None):
     """
     Executa uma única tarefa de scraping e retorna um resumo.
     """
     start_time = time.time()
     start_dt = datetime.now()
     
-    summary = main.execute_scraping() 
+    summary = main.execute_scraping(manter_navegador=manter_navegador, janela_datas=janela_datas)
     
     end_time = time.time()
     duration_seconds = end_time - start_time
 
-    hrs, rem = divmod(duration_seconds, 3600)
-    mins, secs = divmod(rem, 60)
-    duration_str = f"{int(hrs):02d}:{int(mins):02d}:{int(secs):02d}"
+    duration_str = formatar_duracao(duration_seconds)
+    downtime_str = formatar_duracao(summary.get("downtime_seconds", 0))
     start_dt_str = start_dt.strftime("%Y-%m-%d %H:%M:%S")
 
     logging.info(f"Execução concluída em {duration_str}.")
     logging.info(f"Resumo: {summary}")
+    if summary.get("restarts"):
+        logging.info(f"Navegador reiniciado {summary['restarts']} vez(es), {downtime_str} sem processar.")
 
     try:
         logging.info("Renderizando e enviando e-mail de resumo...")
@@ -34,7 +120,10 @@ def run_scraping_task():
             start_dt=start_dt_str,
             duration_seconds=duration_str,
             captured=summary.get("captured", []),
-            errors=summary.get("errors", [])
+            errors=summary.get("errors", []),
+            restarts=summary.get("restarts", 0),
+            downtime=downtime_str,
+            timings=summary.get("timings", [])
         )
         send_via_brevo(html_content, "Relatório de Execução do Scraping")
         logging.info("E-mail de resumo enviado com sucesso.")
@@ -52,30 +141,18 @@ if __name__ == "__main__":
         logging.error("Arquivo 'config.yaml' não encontrado. Encerrando.")
         exit()
 
-    mode = config.get("mode", "range")
+    mode = config.get("mode", "all")
 
     if mode == "scheduled":
-        schedule_config = config.get("schedule", {})
-        interval_str = schedule_config.get("every", "24h")
-        
-        unit = interval_str[-1].lower()
-        value = int(interval_str[:-1])
-        if unit == 'm':
-            sleep_seconds = value * 60
-        elif unit == 'h':
-            sleep_seconds = value * 3600
-        else:
-            sleep_seconds = 24 * 3600 
-
-        logging.info(f"Modo agendado ativado. Executando a cada {interval_str}.")
-        while True:
-            run_scraping_task()
-            logging.info(f"Próxima execução em {interval_str}. Aguardando...")
-            time.sleep(sleep_seconds)
-            
+        iniciar_agendador(config.get("schedule", {}))
+
     elif mode == "range":
-        logging.info("Modo 'range' ativado. Executando a tarefa uma vez.")
-        run_scraping_task()
+        janela = janela_do_config(config.get("range", {}))
+        if janela is None:
+            logging.error("range.start/range.end ausentes ou inválidos (use AAAA-MM-DD). Encerrando.")
+            exit()
+        logging.info(f"Modo 'range' ativado para {janela[0]} a {janela[1]}. Executando a tarefa uma vez.")
+        run_scraping_task(janela_datas=janela)
         
     else: 
         logging.info("Modo 'all' ativado. Executando a tarefa uma vez.")
@@ -1,37 +1,186 @@
+import re
 import time
+import bisect
 import database
-from datetime import date
+from contextlib import contextmanager
+from datetime import date, datetime
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from dotenv import load_dotenv
 import os
+import socket
 import logging
+from utils.config import obter_secao
+from sonda import SondaHttp
+from utils.helpers import click_image, find_date_in_text
+from utils.processos import arvore_processos, rss_mb
+import painel
+import seletores
 
 logger = logging.getLogger(__name__)
 load_dotenv(override=True)
 
+# Lê e ajusta os filtros Chosen pelo <select> original e avisa o widget com 'chosen:updated'.
+_SCRIPT_FILTROS_TODOS = """
+const [classeContainer, textoTodos] = arguments;
+const resultado = {total: 0, alterados: 0, sem_opcao: 0};
+for (const container of document.getElementsByClassName(classeContainer)) {
+    let select = null;
+    if (container.id && container.id.endsWith('_chosen')) {
+        select = document.getElementById(container.id.slice(0, -'_chosen'.length));
+    }
+    if (!select && container.previousElementSibling && container.previousElementSibling.tagName === 'SELECT') {
+        select = container.previousElementSibling;
+    }
+    if (!select) continue;
+    resultado.total++;
+    const opcao = Array.from(select.options).find((o) => o.text.includes(textoTodos));
+    if (!opcao) { resultado.sem_opcao++; continue; }
+    if (select.value === opcao.value) continue;
+    resultado.alterados++;
+    if (window.jQuery) {
+        window.jQuery(select).val(opcao.value).trigger('change').trigger('chosen:updated');
+    } else {
+        select.value = opcao.value;
+        select.dispatchEvent(new Event('change', {bubbles: true}));
+    }
+}
+return resultado;
+"""
+
+# Lê a URL do documento, o nome, a idade e (se configurada) a data de referência do paciente;
+# devolve null enquanto o nome ou a idade não existirem.
+_SCRIPT_CAMPOS_PACIENTE = """
+const nome = document.getElementById(arguments[0]);
+const idade = document.getElementById(arguments[1]);
+if (!nome || !idade) return null;
+const data = arguments[2] ? document.getElementById(arguments[2]) : null;
+return [location.href, nome.value || '', idade.innerText || '', data ? (data.value || data.innerText || '') : null];
+"""
+
+def url_do_paciente(url, id_paciente):
+    """
+    Indica se a URL termina no ID do paciente (sem ser apenas o final de um ID maior).
+    Com pageLoadStrategy 'none' ou no modo pipeline, o documento anterior ainda pode estar na aba.
+    """
+    fim = re.search(r"(\d+)$", url or "")
+    return fim is not None and fim.group(1).lstrip("0") == str(id_paciente).lstrip("0")
+
+class LotePerdido(Exception):
+    """
+    O lease do lote em processamento expirou e foi assumido por outro nó.
+    """
+
+class ReciclarNavegador(Exception):
+    """
+    O navegador passou dos limites de memória ou de pacientes e deve ser substituído.
+    Lançada entre dois IDs, depois de gravado o progresso.
+    """
+
 class Scraper:
-    def __init__(self, driver):
+    def __init__(self, driver, run_id=None):
         self.driver = driver
-        self.wait = WebDriverWait(driver, 10)
+        # Identifica a execução nos tempos por etapa gravados na tabela 'timings'
+        self.run_id = run_id
+        self.wait = WebDriverWait(driver, 10, poll_frequency=0.1)
+        config_browser = obter_secao("browser")
+        # Estratégia efetiva da sessão, e não a do config.yaml: o benchmark força o perfil pelo Browser
+        capacidades = getattr(driver, "capabilities", None) or {}
+        self._carregamento_sem_espera = capacidades.get("pageLoadStrategy") == "none"
         self.url_base = os.getenv('LINK_BASE')
         self.numero_base = int(os.getenv('ID_BASE'))
+        self.captured: list[dict] = []
+        self.not_found: list[dict] = []
+        self.errors: list[str] = []
+        self.lease = None
+        self.ultima_data = None
+        self._datas_lidas = 0
+        # Lido pelo watchdog (supervisor.py) para detectar chamadas ao navegador que não retornam
+        self.ultimo_progresso = time.monotonic()
+        self.config_sonda = obter_secao("http_probe")
+        self.config_confirmacao = obter_secao("confirmation")
+        # Sem tela (headless) não há como localizar img/ok.png
+        self._fallback_imagem = (
+            self.config_confirmacao.get("image_fallback", True) and not config_browser.get("headless")
+        )
+        self.sonda = None
+        self._sondagens = {}
+        self.pipeline = bool(obter_secao("pipeline").get("enabled"))
+        self.ao_criar_aba = None
+        self._aba_atual = None
+        self._aba_prefetch = None
+        self._id_prefetch = None
+        self.config_reciclagem = obter_secao("recycling")
+        self._amostrar_a_cada = max(0, int(self.config_reciclagem.get("sample_every", 200)))
+        self._pacientes_desde_amostra = 0
+        self._pacientes_no_navegador = 0
+        self._inicio_amostra = time.monotonic()
+        self._metricas_cdp_ativas = False
+
+    @contextmanager
+    def _medir_etapa(self, etapa, id_paciente):
+        """
+        Registra na tabela 'timings' a duração do bloco como uma etapa do paciente.
+        """
+        inicio = datetime.now()
+        relogio = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.run_id is not None:
+                database.registrar_tempo(self.run_id, etapa, id_paciente, inicio, time.perf_counter() - relogio)
+
+    def add_error(self, msg, patient_id=None):
+        """
+        Registra um erro no resumo da execução.
+        """
+        if patient_id is not None:
+            msg = f"[ID {patient_id}] {msg}"
+        logger.error(msg)
+        self.errors.append(msg)
+
+    def add_not_found_patient(self, patient_id, name, patient_dob, exam_date, motivo):
+        """
+        Registra no resumo um paciente cujos exames não puderam ser verificados na Vöiston.
+        """
+        print(f"Paciente {patient_id}: {motivo}")
+        self.not_found.append({
+            "id": patient_id,
+            "name": name,
+            "dob": patient_dob,
+            "exam_date": exam_date,
+            "reason": motivo,
+        })
 
     def validate_patient(self, id_atual):
         """
         Função principal para validar os dados do paciente.
+        Retorna (True, nome) para paciente válido, (False, None) para página em branco
+        e (None, None) quando ocorre um erro inesperado (o ID será reprocessado depois).
+        A data de referência lida da página fica em self.ultima_data (None se ausente).
         """
         try:
-            nome_paciente_input = self.wait.until(
-                EC.presence_of_element_located((By.ID, "txtMODERNA_PESSOAFISICA"))
-            )
-            idade_div = self.wait.until(
-                EC.presence_of_element_located((By.ID, "PEP2200000_IDADE"))
-            )
-            nome_paciente = nome_paciente_input.get_attribute('value')
-            idade_texto = idade_div.text
+            # A aba pré-carregada (pipeline) ou sem espera de carregamento pode ainda ter o documento anterior
+            conferir_url = self._carregamento_sem_espera or self.pipeline
+
+            def ler_campos(driver):
+                campos = driver.execute_script(
+                    _SCRIPT_CAMPOS_PACIENTE,
+                    seletores.seletor("pagina", "campo_nome"), seletores.seletor("pagina", "campo_idade"),
+                    seletores.grupo("pagina").get("campo_data") or None
+                )
+                # Descarta o documento de outro paciente que ainda esteja na aba
+                if not campos or (conferir_url and not url_do_paciente(campos[0], id_atual)):
+                    return None
+                return campos[1:]
+
+            # Prontidão explícita: com pageLoadStrategy 'eager'/'none' a página pode não ter terminado
+            # de carregar; os campos são lidos juntos em uma única chamada JS por tentativa.
+            self.ultima_data = None
+            with seletores.medir("pagina.campos_paciente"):
+                nome_paciente, idade_texto, data_texto = self.wait.until(ler_campos)
+            # Data de cadastro/atendimento, usada pelo índice ID -> data do modo range
+            self.ultima_data = find_date_in_text(data_texto)
             if not nome_paciente and idade_texto.strip() == "0m 0d":
                 print(f"ID {id_atual}: Paciente em branco (Nome vazio e Idade 0m 0d).")
                 return False, None
@@ -43,77 +192,569 @@ class Scraper:
             return False, None
         except Exception as e:
             logger.error(f"Erro inesperado ao validar página para ID {id_atual}: {e}")
-            database.registrar_paciente(id_atual, 'erro_geral')
-            return False, None
+            return None, None
 
     def configurar_filtros_totais(self):
+        """
+        Garante que todos os filtros Chosen da página estejam em '(Todos)'.
+        O estado é conferido a cada paciente em uma única chamada JS sobre os <select> originais;
+        a escrita (e o aviso 'chosen:updated') só acontece nos filtros que não estão em '(Todos)'.
+        """
         try:
-            # 1. Localiza todos os containers de filtros Chosen na página
-            filtros = self.driver.find_elements(By.CLASS_NAME, "chosen-container")
-
-            for filtro in filtros:
-                # Verifica o texto atual do filtro
-                texto_atual = filtro.find_element(By.CSS_SELECTOR, "a.chosen-single span").text
-
-                if "(Todos)" not in texto_atual:
-                    print(f"Configurando filtro para '(Todos)'...")
-                    filtro.click()
-                    time.sleep(0.5)
-                    opcao_todos = filtro.find_element(By.XPATH, ".//li[contains(text(), '(Todos)')]")
-                    opcao_todos.click()
-                    time.sleep(0.5)
-                else:
-                    print("Filtro já está configurado como '(Todos)'.")
+            with seletores.medir("pagina.filtro_chosen"):
+                resultado = self.driver.execute_script(
+                    _SCRIPT_FILTROS_TODOS, seletores.seletor("pagina", "filtro_chosen"), "(Todos)"
+                )
+
+            if resultado["alterados"]:
+                print(f"{resultado['alterados']} filtro(s) configurado(s) para '(Todos)'.")
+            if resultado["sem_opcao"]:
+                print(f"{resultado['sem_opcao']} filtro(s) sem a opção '(Todos)'.")
 
         except Exception as e:
             print(f"Erro ao configurar filtros: {e}")
 
-    def _executar_fase(self, direcao, id_inicial, id_limite):
+    def _executar_fase(self, direcao, id_inicial, id_limite, buscar_fronteira=False):
         """
         Executa uma fase de scraping a partir de um ID inicial específico.
         Continua até atingir o ID limite, pulando IDs em branco.
+        Os trechos concluídos são gravados em 'faixas_varridas' durante a fase, de modo que
+        uma interrupção deixa apenas a parte não processada como lacuna.
+        Com buscar_fronteira, após uma sequência de IDs em branco a fase estima o fim do espaço
+        populado (ver _buscar_fronteira) e termina logo depois dele.
         """
         id_atual = id_inicial
         incremento = 1 if direcao == 'para_cima' else -1
+        inicio_faixa = id_inicial
+        ultimo_concluido = None
+        processados = 0
+
+        config_fronteira = obter_secao("boundary_search")
+        buscar_fronteira = buscar_fronteira and bool(config_fronteira.get("enabled"))
+        limite_brancos = max(1, int(config_fronteira.get("blank_streak", 50)))
+        brancos_consecutivos = 0
+        ultimo_populado = None
+        sondado_ate = None
+        parou_na_fronteira = False
+        limite_configurado = id_limite
+        if buscar_fronteira:
+            # Retoma a partir da fronteira gravada: os IDs entre ela e o início já estavam em branco
+            fronteira_salva = database.obter_fronteira(direcao)
+            if fronteira_salva is not None and (id_inicial - fronteira_salva) * incremento > 0:
+                ultimo_populado = fronteira_salva
+                brancos_consecutivos = min(limite_brancos - 1, abs(id_inicial - fronteira_salva) - 1)
 
         print(f"--- Iniciando Fase '{direcao.upper()}' a partir do ID: {id_atual} ---")
 
-        while True:
-            # Verifica se atingiu o limite
-            if direcao == 'para_cima' and id_atual > id_limite:
-                break
-            if direcao == 'para_baixo' and id_atual < id_limite:
-                break
+        try:
+            while True:
+                self._renovar_lease()
+                self.ultimo_progresso = time.monotonic()
+
+                # Verifica se atingiu o limite
+                if direcao == 'para_cima' and id_atual > id_limite:
+                    break
+                if direcao == 'para_baixo' and id_atual < id_limite:
+                    break
+
+                # Salta de uma vez os trechos de IDs já verificados
+                proximo_id = database.proximo_id_nao_verificado(id_atual, direcao)
+                if proximo_id != id_atual:
+                    ultimo_concluido = proximo_id - incremento
+                    if (ultimo_concluido - id_limite) * incremento > 0:
+                        ultimo_concluido = id_limite
+                    id_atual = proximo_id
+                    continue
+
+                if self._classificar_por_sonda(id_atual, direcao, id_limite) is False:
+                    print(f"ID {id_atual}: Em branco segundo a sonda HTTP, sem abrir no navegador.")
+                    eh_valido, nome_paciente = False, None
+                    abriu_no_navegador = False
+                else:
+                    with self._medir_etapa('navegacao', id_atual):
+                        self._navegar(id_atual, direcao, id_limite)
+                    abriu_no_navegador = True
+
+                    with self._medir_etapa('validate_patient', id_atual):
+                        eh_valido, nome_paciente = self.validate_patient(id_atual)
+
+                if eh_valido is not False:
+                    brancos_consecutivos = 0
+                    ultimo_populado = id_atual
+                    if eh_valido and parou_na_fronteira:
+                        # Paciente além da fronteira estimada: a estimativa estava errada
+                        print(f"ID {id_atual} populado após a fronteira estimada. Fase volta a ir até {limite_configurado}.")
+                        id_limite = limite_configurado
+                        parou_na_fronteira = False
+                        sondado_ate = None
+                else:
+                    brancos_consecutivos += 1
+
+                if eh_valido and self.ultima_data:
+                    database.registrar_amostra_data(id_atual, self.ultima_data)
+                if eh_valido:
+                    print(f">>> Sucesso! Paciente '{nome_paciente}'. Registrando e extraindo dados...")
+                    with self._medir_etapa('configurar_filtros_totais', id_atual):
+                        self.configurar_filtros_totais()
+                    with self._medir_etapa('scraping_extension', id_atual):
+                        self.scraping_extension(str(id_atual), nome_paciente, None, None)
+                    database.registrar_paciente(id_atual, 'sucesso', nome_paciente)
+                    self.captured.append({"id": id_atual, "name": nome_paciente, "exam_date": None})
+                    ultimo_concluido = id_atual
+                elif eh_valido is None:
+                    # Erro inesperado: o ID fica fora das faixas varridas para ser revisitado
+                    database.registrar_paciente(id_atual, database.STATUS_REPROCESSAR)
+                    self._registrar_faixa(inicio_faixa, ultimo_concluido)
+                    inicio_faixa = id_atual + incremento
+                    ultimo_concluido = None
+                else:
+                    database.registrar_paciente(id_atual, 'nao_encontrado')
+                    print(f"ID {id_atual}: Em branco, pulando...")
+                    ultimo_concluido = id_atual
+
+                processados += 1
+                if processados % database.TAMANHO_LOTE == 0:
+                    self._registrar_faixa(inicio_faixa, ultimo_concluido)
+                if abriu_no_navegador:
+                    self._verificar_reciclagem()
+
+                if (buscar_fronteira and brancos_consecutivos >= limite_brancos
+                        and (sondado_ate is None or (id_atual - sondado_ate) * incremento > 0)):
+                    base = ultimo_populado if ultimo_populado is not None else id_inicial - incremento
+                    fronteira, sondado_ate = self._buscar_fronteira(base, direcao, id_limite, config_fronteira)
+                    if fronteira is not None:
+                        novo_limite = fronteira + limite_brancos * incremento
+                        if (novo_limite - id_limite) * incremento < 0:
+                            print(f"Fronteira do espaço populado estimada em {fronteira}. Fase encerrará em {novo_limite}.")
+                            id_limite = novo_limite
+                            parou_na_fronteira = True
 
-            # Pula IDs já verificados
-            if database.verificar_id_existente(id_atual):
                 id_atual += incremento
-                continue
+        finally:
+            self._registrar_faixa(inicio_faixa, ultimo_concluido)
+
+        if parou_na_fronteira:
+            database.registrar_fronteira(direcao, ultimo_populado if ultimo_populado is not None else id_limite)
+        print(f"--- Fase '{direcao.upper()}' concluída: ID limite {id_limite} atingido. ---")
 
-            url_alvo = f"{self.url_base}{id_atual}"
+    def _navegar(self, id_atual, direcao, id_limite):
+        """
+        Abre a página do paciente na aba ativa. No modo pipeline, usa a segunda aba se ela já
+        estiver carregando este ID e, em seguida, dispara nela o carregamento do próximo ID
+        não verificado, que acontece enquanto a extensão processa o paciente atual.
+        """
+        url_alvo = f"{self.url_base}{id_atual}"
+        if not self.pipeline:
             print(f"Navegando para: {url_alvo}")
             self.driver.get(url_alvo)
-            
-            eh_valido, nome_paciente = self.validate_patient(id_atual)
+            return
+
+        if self._aba_atual is None:
+            self._aba_atual = self.driver.current_window_handle
+            self.driver.switch_to.new_window('tab')
+            self._aba_prefetch = self.driver.current_window_handle
+            if self.ao_criar_aba:
+                self.ao_criar_aba()
+            self.driver.switch_to.window(self._aba_atual)
+
+        if self._id_prefetch == id_atual:
+            print(f"Usando página pré-carregada: {url_alvo}")
+            self._aba_atual, self._aba_prefetch = self._aba_prefetch, self._aba_atual
+            self.driver.switch_to.window(self._aba_atual)
+        else:
+            print(f"Navegando para: {url_alvo}")
+            self.driver.get(url_alvo)
+        self._id_prefetch = None
 
-            if eh_valido:
-                print(f">>> Sucesso! Paciente '{nome_paciente}'. Registrando e extraindo dados...")
-                self.configurar_filtros_totais()
-                self.scraping_extension(str(id_atual), nome_paciente, None, None)
-                database.registrar_paciente(id_atual, 'sucesso', nome_paciente)
+        # Próximo ID a ser aberto pelo navegador (pula os verificados e os descartados pela sonda)
+        incremento = 1 if direcao == 'para_cima' else -1
+        proximo = id_atual + incremento
+        while True:
+            proximo = database.proximo_id_nao_verificado(proximo, direcao)
+            if self._sondagens.get(proximo) is not False:
+                break
+            proximo += incremento
+        if (proximo - id_limite) * incremento > 0:
+            return
+
+        # location.href retorna sem aguardar o carregamento da página
+        self.driver.switch_to.window(self._aba_prefetch)
+        self.driver.execute_script("window.location.href = arguments[0];", f"{self.url_base}{proximo}")
+        self.driver.switch_to.window(self._aba_atual)
+        self._id_prefetch = proximo
+
+    def _id_populado(self, id_paciente):
+        """
+        Verifica se um ID tem paciente, sem registrá-lo: usa a sonda HTTP quando habilitada
+        e o navegador como alternativa. Em caso de dúvida considera o ID populado.
+        """
+        self.ultimo_progresso = time.monotonic()
+        if self.config_sonda.get("enabled") and self.sonda is not None:
+            resultado = self.sonda.sondar(id_paciente)
+            if resultado is not None:
+                return resultado
+        self.driver.get(f"{self.url_base}{id_paciente}")
+        eh_valido, _ = self.validate_patient(id_paciente)
+        return eh_valido is not False
+
+    def _janela_populada(self, inicio, incremento, limite, largura):
+        """
+        Sonda até largura IDs consecutivos a partir de inicio (sem passar de limite) e retorna
+        o primeiro populado, ou None se a janela inteira estiver em branco.
+        """
+        for deslocamento in range(largura):
+            candidato = inicio + deslocamento * incremento
+            if (candidato - limite) * incremento > 0:
+                break
+            if self._id_populado(candidato):
+                return candidato
+        return None
+
+    def _buscar_fronteira(self, ultimo_populado, direcao, id_limite, config_fronteira):
+        """
+        Estima o último ID populado na direção da fase, a partir de ultimo_populado.
+        Sonda janelas de range.scan IDs em passos exponencialmente maiores (galope) até achar
+        uma janela inteira em branco e então faz busca binária entre o último ID populado e
+        essa janela, até a resolução da sequência de brancos. Só uma janela confirmada em branco
+        aproxima a fronteira. Retorna (fronteira ou None, último ID sondado). None indica que o
+        orçamento de janelas acabou sem uma estimativa confiável e a fase deve seguir normalmente.
+        """
+        incremento = 1 if direcao == 'para_cima' else -1
+        limite_brancos = max(1, int(config_fronteira.get("blank_streak", 50)))
+        orcamento = max(1, int(config_fronteira.get("probe_budget", 20)))
+        largura = max(1, int(obter_secao("range").get("scan", 3)))
+        baixo = ultimo_populado
+        alto = None
+        passo = 2 * limite_brancos
+        sondas = 0
+        print(f"Buscando fronteira '{direcao}' a partir do último ID populado {baixo}...")
+
+        # Galope: dobra o passo enquanto encontra pacientes
+        while sondas < orcamento:
+            candidato = baixo + passo * incremento
+            if (candidato - id_limite) * incremento > 0:
+                candidato = id_limite
+            if candidato == baixo:
+                break
+            sondas += 1
+            populado = self._janela_populada(candidato, incremento, id_limite, largura)
+            if populado is not None:
+                baixo = populado
+                passo *= 2
             else:
-                database.registrar_paciente(id_atual, 'nao_encontrado')
-                print(f"ID {id_atual}: Em branco, pulando...")
-            
-            id_atual += incremento
-        
-        print(f"--- Fase '{direcao.upper()}' concluída: ID limite {id_limite} atingido. ---")
+                alto = candidato
+                break
 
-    def iniciar_scraping(self):
+        if alto is None:
+            # Nenhuma janela em branco dentro do orçamento (ou limite atingido): sem estimativa
+            return None, baixo
+
+        # Busca binária entre baixo (populado) e alto (início de uma janela em branco)
+        while abs(alto - baixo) > limite_brancos and sondas < orcamento:
+            meio = baixo + (alto - baixo) // 2
+            sondas += 1
+            populado = self._janela_populada(meio, incremento, alto - incremento, largura)
+            if populado is not None:
+                baixo = populado
+            else:
+                alto = meio
+
+        if abs(alto - baixo) > limite_brancos:
+            return None, alto
+        print(f"Fronteira estimada em {baixo} após {sondas} janela(s) sondada(s).")
+        return baixo, alto
+
+    def _data_do_id(self, id_paciente):
+        """
+        Lê a data de referência de um ID (sonda HTTP quando habilitada, navegador como
+        alternativa) e a acrescenta ao índice. Retorna False para IDs em branco e None
+        quando a data não pôde ser lida; um ID em branco para a sonda não é aberto no navegador.
+        """
+        self.ultimo_progresso = time.monotonic()
+        data = None
+        if self.config_sonda.get("enabled"):
+            if self.sonda is None:
+                self.sonda = SondaHttp.a_partir_do_driver(
+                    self.driver, self.url_base, concorrencia=int(self.config_sonda.get("concurrency", 8)),
+                    timeout=float(self.config_sonda.get("timeout", 10)),
+                )
+            data = self.sonda.data_paciente(id_paciente)
+        if data is None:
+            self.driver.get(f"{self.url_base}{id_paciente}")
+            eh_valido, _ = self.validate_patient(id_paciente)
+            data = self.ultima_data if eh_valido else eh_valido
+        if data:
+            database.registrar_amostra_data(id_paciente, data)
+        return data
+
+    def _galopar(self, inicio, sentido, limite, sondas, orcamento, varredura):
+        """
+        Procura um ID com data a partir de inicio, no sentido indicado e sem alcançar limite:
+        varredura IDs um a um e depois em passos que dobram. Retorna ((id, data) ou None,
+        sondas usadas até agora, True se chegou ao limite sem achar nada).
+        """
+        candidato, passo = inicio, 1
+        while (limite - candidato) * sentido > 0:
+            if sondas >= orcamento:
+                return None, sondas, False
+            sondas += 1
+            data = self._data_do_id(candidato)
+            if data:
+                return (candidato, data), sondas, False
+            if abs(candidato - inicio) + 1 >= varredura:
+                passo *= 2
+            candidato += passo * sentido
+        return None, sondas, True
+
+    def _refinar_limite(self, baixo, alto, antes_do_limite, config_range, alto_datado=True):
+        """
+        Busca binária por sondagem entre dois IDs: baixo tem data antes do limite e alto depois
+        (ou são os extremos da faixa; alto_datado indica se alto é uma amostra com data).
+        Para quando o intervalo fica menor que range.resolution ou o orçamento de sondas acaba.
+        Quando o ponto médio está em branco ou sem data, procura um ID com data acima dele até
+        alto e, se não houver, abaixo dele até baixo (ver _galopar). Nada acima do ponto médio
+        com alto sendo o extremo da faixa indica o fim do espaço populado; nada dos dois lados
+        interrompe a busca com o intervalo ainda largo. Retorna (baixo, alto).
+        """
+        resolucao = max(1, int(config_range.get("resolution", 100)))
+        orcamento = max(0, int(config_range.get("probe_budget", 150)))
+        varredura = max(1, int(config_range.get("scan", 3)))
+        sondas = 0
+        while alto - baixo > resolucao and sondas < orcamento:
+            meio = baixo + (alto - baixo) // 2
+            encontrado, sondas, esgotou_acima = self._galopar(meio, 1, alto, sondas, orcamento, varredura)
+            if encontrado is None and esgotou_acima and not alto_datado:
+                alto = meio
+                continue
+            if encontrado is None:
+                encontrado, sondas, _ = self._galopar(meio - 1, -1, baixo, sondas, orcamento, varredura)
+            if encontrado is None:
+                # Data não resolvida: mantém o intervalo largo em vez de arriscar perder IDs da janela
+                break
+            self._datas_lidas += 1
+            candidato, data = encontrado
+            if antes_do_limite(data):
+                baixo = candidato
+            else:
+                alto = candidato
+                alto_datado = True
+        return baixo, alto
+
+    def limites_por_datas(self, data_inicio, data_fim, id_minimo, id_maximo):
+        """
+        Converte uma janela de datas em uma faixa de IDs usando o índice ID -> data
+        ('amostras_datas'): busca binária nas amostras e, quando o intervalo entre duas amostras
+        ainda é largo, sondagem de novos IDs (que passam a fazer parte do índice).
+        Supõe datas crescentes com o ID; a faixa devolvida inclui os intervalos de incerteza.
+        Retorna None quando nenhuma data pôde ser lida (índice vazio e nenhuma sonda com data),
+        caso em que a faixa não tem como ser estimada.
+        """
+        if not seletores.grupo("pagina").get("campo_data"):
+            raise ValueError("Seletor 'pagina.campo_data' não configurado em seletores.yaml: o modo range não tem como ler as datas.")
+        config_range = obter_secao("range")
+        # O fim conhecido do espaço populado evita sondar a faixa vazia até ID_MAXIMO
+        fronteira = database.obter_fronteira('para_cima')
+        if fronteira is not None and fronteira < id_maximo:
+            id_maximo = fronteira + max(1, int(obter_secao("boundary_search").get("blank_streak", 50)))
+        amostras = [(i, d) for i, d in database.obter_amostras_datas() if id_minimo <= i <= id_maximo]
+        ids = [i for i, _ in amostras]
+        datas = [d for _, d in amostras]
+        print(f"Índice de datas com {len(amostras)} amostra(s) entre os IDs {id_minimo} e {id_maximo}.")
+        self._datas_lidas = 0
+
+        # Início: último ID com data anterior a data_inicio / primeiro com data >= data_inicio
+        posicao = bisect.bisect_left(datas, data_inicio)
+        baixo = ids[posicao - 1] if posicao > 0 else id_minimo
+        alto = ids[posicao] if posicao < len(ids) else id_maximo
+        id_inicio, _ = self._refinar_limite(
+            baixo, alto, lambda d: d < data_inicio, config_range, alto_datado=posicao < len(ids)
+        )
+
+        # Fim: último ID com data <= data_fim / primeiro com data posterior
+        posicao = bisect.bisect_right(datas, data_fim)
+        baixo = ids[posicao - 1] if posicao > 0 else id_minimo
+        alto = ids[posicao] if posicao < len(ids) else id_maximo
+        _, id_fim = self._refinar_limite(
+            max(baixo, id_inicio), alto, lambda d: d <= data_fim, config_range, alto_datado=posicao < len(ids)
+        )
+
+        database.flush_registros()
+        if not amostras and not self._datas_lidas:
+            return None
+        return id_inicio, max(id_inicio, id_fim)
+
+    def _classificar_por_sonda(self, id_atual, direcao, id_limite):
+        """
+        Retorna a classificação HTTP do ID (True, False = em branco, None = indefinido).
+        Quando o ID ainda não foi sondado, sonda em paralelo o próximo lote de IDs não verificados.
+        """
+        if not self.config_sonda.get("enabled"):
+            return None
+        if id_atual not in self._sondagens:
+            if self.sonda is None:
+                self.sonda = SondaHttp.a_partir_do_driver(
+                    self.driver, self.url_base,
+                    concorrencia=int(self.config_sonda.get("concurrency", 8)),
+                    timeout=float(self.config_sonda.get("timeout", 10)),
+                )
+            else:
+                self.sonda.atualizar_cookies(self.driver.get_cookies())
+
+            incremento = 1 if direcao == 'para_cima' else -1
+            tamanho = max(1, int(self.config_sonda.get("batch_size", 32)))
+            ids = []
+            candidato = id_atual
+            while len(ids) < tamanho:
+                candidato = database.proximo_id_nao_verificado(candidato, direcao)
+                if (candidato - id_limite) * incremento > 0:
+                    break
+                ids.append(candidato)
+                candidato += incremento
+            self._sondagens = self.sonda.sondar_varios(ids)
+        return self._sondagens.pop(id_atual, None)
+
+    def medir_memoria(self):
+        """
+        Lê as métricas de memória da aba ativa (CDP Performance.getMetrics) e a memória
+        residente somada do chromedriver e de todos os processos do Chrome.
+        """
+        metricas = {}
+        try:
+            if not self._metricas_cdp_ativas:
+                self.driver.execute_cdp_cmd("Performance.enable", {})
+                self._metricas_cdp_ativas = True
+            resposta = self.driver.execute_cdp_cmd("Performance.getMetrics", {})
+            valores = {m["name"]: m["value"] for m in resposta.get("metrics", [])}
+            metricas["heap_mb"] = valores.get("JSHeapUsedSize", 0) / (1024 * 1024)
+            metricas["nos_dom"] = int(valores.get("Nodes", 0))
+            metricas["ouvintes"] = int(valores.get("JSEventListeners", 0))
+        except Exception as e:
+            logger.warning(f"Não foi possível ler Performance.getMetrics: {e}")
+        processo = getattr(getattr(self.driver, "service", None), "process", None)
+        if processo is not None:
+            metricas["rss_mb"] = rss_mb(arvore_processos(processo.pid))
+        return metricas
+
+    def _verificar_reciclagem(self):
+        """
+        A cada 'recycling.sample_every' pacientes abertos no navegador, registra as métricas de
+        memória com a latência média por ID do intervalo e, se algum limite for excedido,
+        recicla a aba (tab_heap_mb) ou pede um navegador novo (browser_rss_mb, max_patients_per_browser).
+        """
+        self._pacientes_no_navegador += 1
+        if not self._amostrar_a_cada:
+            return
+        self._pacientes_desde_amostra += 1
+        if self._pacientes_desde_amostra < self._amostrar_a_cada:
+            return
+
+        latencia = (time.monotonic() - self._inicio_amostra) / self._pacientes_desde_amostra
+        metricas = self.medir_memoria()
+        print(
+            f"Métricas do navegador após {self._pacientes_no_navegador} paciente(s): "
+            f"heap JS {metricas.get('heap_mb', 0):.0f} MB, {metricas.get('nos_dom', 0)} nós DOM, "
+            f"{metricas.get('ouvintes', 0)} ouvintes, RSS {metricas.get('rss_mb', 0):.0f} MB, "
+            f"latência média {latencia:.2f}s/ID"
+        )
+        self._pacientes_desde_amostra = 0
+        self._inicio_amostra = time.monotonic()
+
+        if not self.config_reciclagem.get("enabled"):
+            return
+        limite_pacientes = int(self.config_reciclagem.get("max_patients_per_browser", 0))
+        limite_rss = float(self.config_reciclagem.get("browser_rss_mb", 0))
+        limite_heap = float(self.config_reciclagem.get("tab_heap_mb", 0))
+        if limite_pacientes and self._pacientes_no_navegador >= limite_pacientes:
+            raise ReciclarNavegador(f"{self._pacientes_no_navegador} pacientes abertos no mesmo navegador.")
+        if limite_rss and metricas.get("rss_mb", 0) >= limite_rss:
+            raise ReciclarNavegador(f"Memória do navegador em {metricas['rss_mb']:.0f} MB.")
+        if limite_heap and metricas.get("heap_mb", 0) >= limite_heap:
+            print(f"Heap JS da aba em {metricas['heap_mb']:.0f} MB. Reciclando a aba.")
+            self.reciclar_aba()
+
+    def reciclar_aba(self):
+        """
+        Substitui as abas de trabalho por uma aba nova na mesma sessão (cookies e login
+        da extensão são mantidos) e fecha as antigas.
+        """
+        antigas = self.driver.window_handles
+        self.driver.switch_to.new_window('tab')
+        nova = self.driver.current_window_handle
+        for aba in antigas:
+            self.driver.switch_to.window(aba)
+            self.driver.close()
+        self.driver.switch_to.window(nova)
+        if self.ao_criar_aba:
+            self.ao_criar_aba()
+        self._metricas_cdp_ativas = False
+        # O pipeline recria a aba de pré-carregamento na próxima navegação
+        self._aba_atual = None
+        self._aba_prefetch = None
+        self._id_prefetch = None
+
+    def _registrar_faixa(self, inicio, ultimo_concluido):
+        """
+        Grava o trecho contíguo [inicio, ultimo_concluido] da fase atual como varrido.
+        """
+        if ultimo_concluido is not None:
+            database.registrar_faixa_varrida(inicio, ultimo_concluido)
+
+    def _renovar_lease(self):
+        """
+        Envia o heartbeat do lote em processamento quando o intervalo configurado expira.
+        """
+        if self.lease is None or time.monotonic() - self.lease["ultimo_heartbeat"] < self.lease["intervalo"]:
+            return
+        if not database.renovar_lote(self.lease["inicio"], self.lease["dono"], self.lease["duracao"]):
+            raise LotePerdido(f"Lease do lote {self.lease['inicio']} a {self.lease['fim']} foi perdido.")
+        self.lease["ultimo_heartbeat"] = time.monotonic()
+
+    def _executar_por_leases(self, id_minimo, id_maximo, config_fila):
+        """
+        Consome lotes da tabela 'lotes_trabalho' compartilhada entre contêineres até não restar
+        nenhum lote livre. Leases expirados de nós mortos são recuperados automaticamente; um lote
+        reservado lease_queue.max_attempts vezes sem ser concluído é marcado como 'falhou'.
+        """
+        duracao = float(config_fila.get("lease_seconds", 300))
+        max_tentativas = max(1, int(config_fila.get("max_attempts", 3)))
+        intervalo = float(config_fila.get("heartbeat_seconds", duracao / 5))
+        dono = f"{socket.gethostname()}-{os.getpid()}"
+        database.criar_lotes_trabalho(id_minimo, id_maximo, max(1, int(config_fila.get("chunk_size", 1000))))
+        print(f"Modo fila compartilhada ativado. Identificador deste nó: {dono}")
+
+        while True:
+            lote = database.reivindicar_lote(dono, duracao, self.numero_base, max_tentativas)
+            if lote is None:
+                print("Nenhum lote livre restante na fila compartilhada.")
+                break
+            inicio, fim = lote
+            print(f"Lote {inicio} a {fim} reservado por {dono}.")
+            self.lease = {"inicio": inicio, "fim": fim, "dono": dono, "duracao": duracao,
+                          "intervalo": intervalo, "ultimo_heartbeat": time.monotonic()}
+            try:
+                self.varrer_faixa(inicio, fim)
+                database.finalizar_lote(inicio, dono)
+            except LotePerdido as e:
+                logger.warning(str(e))
+            except ReciclarNavegador:
+                database.finalizar_lote(inicio, dono, concluido=False, max_tentativas=max_tentativas,
+                                        contar_tentativa=False)
+                raise
+            except Exception:
+                if database.finalizar_lote(inicio, dono, concluido=False, max_tentativas=max_tentativas) == 'falhou':
+                    self.add_error(f"Lote {inicio} a {fim} abandonado após {max_tentativas} tentativa(s).")
+                raise
+            finally:
+                self.lease = None
+
+    def iniciar_scraping(self, janela_datas=None):
         """
         Orquestra o scraping em duas fases:
         1ª Fase: Começa do ID base e desce (decrementa) até o ID mínimo
         2ª Fase: Volta ao ID base e sobe (incrementa) até o ID máximo
+        Em cada fase, apenas as lacunas ainda não varridas (tabela 'faixas_varridas') são visitadas.
+        Com janela_datas (data_inicio, data_fim), apenas a faixa de IDs correspondente
+        (ver limites_por_datas) é varrida, em ordem crescente.
         """
         print(f"ID Base configurado: {self.numero_base}")
         
@@ -121,228 +762,190 @@ class Scraper:
         id_minimo = int(os.getenv('ID_MINIMO', '1'))  # ID mínimo a verificar
         id_maximo = int(os.getenv('ID_MAXIMO', '999999'))  # ID máximo a verificar
 
-        # Fase 1: Descer a partir do ID base
-        menor_id = database.obter_menor_id_verificado(self.numero_base)
-        id_inicial_para_baixo = self.numero_base - 1
-        if menor_id and menor_id < self.numero_base:
-            id_inicial_para_baixo = menor_id - 1
-            print(f"Retomando varredura 'para baixo' do último ID salvo: {menor_id}")
-        else:
-            print(f"Iniciando varredura 'para baixo' a partir do ID base: {self.numero_base}")
-            
-        self._executar_fase('para_baixo', id_inicial_para_baixo, id_minimo)
+        # Carrega uma única vez os IDs já verificados como intervalos em memória
+        database.carregar_indice_verificados()
+
+        if janela_datas:
+            data_inicio, data_fim = janela_datas
+            limites = self.limites_por_datas(data_inicio, data_fim, id_minimo, id_maximo)
+            if limites is None:
+                # Sem nenhuma data não há como delimitar a janela: varre tudo em vez de quase nada
+                self.add_error(
+                    f"Nenhuma data lida no campo 'pagina.campo_data' ao delimitar a janela {data_inicio} a "
+                    f"{data_fim}. Varrendo a faixa completa."
+                )
+                janela_datas = None
+            else:
+                id_minimo, id_maximo = limites
+                print(f"Janela {data_inicio} a {data_fim} corresponde aos IDs {id_minimo} a {id_maximo}.")
+
+        config_fila = obter_secao("lease_queue")
+        if config_fila.get("enabled"):
+            self._executar_por_leases(id_minimo, id_maximo, config_fila)
+            print("Scraping concluído.")
+            return
+
+        if janela_datas:
+            for inicio, fim in database.obter_lacunas(id_minimo, id_maximo):
+                print(f"Varrendo lacuna da janela de datas: {inicio} a {fim}")
+                self._executar_fase('para_cima', inicio, fim, buscar_fronteira=(fim == id_maximo))
+            print("Scraping concluído.")
+            return
+
+        # Fase 1: Descer a partir do ID base, da lacuna mais próxima para a mais distante
+        lacunas_abaixo = database.obter_lacunas(id_minimo, self.numero_base - 1)
+        if not lacunas_abaixo:
+            print(f"Faixa 'para baixo' ({id_minimo} a {self.numero_base - 1}) já varrida por completo.")
+        for inicio, fim in reversed(lacunas_abaixo):
+            print(f"Varrendo lacuna 'para baixo': {fim} a {inicio}")
+            self._executar_fase('para_baixo', fim, inicio, buscar_fronteira=(inicio == id_minimo))
 
         # Fase 2: Subir a partir do ID base
-        maior_id = database.obter_maior_id_verificado()
-        id_inicial_para_cima = self.numero_base
-        if maior_id and maior_id >= self.numero_base:
-            id_inicial_para_cima = maior_id + 1
-            print(f"Retomando varredura 'para cima' do último ID salvo: {maior_id}")
-        else:
-            print(f"Iniciando varredura 'para cima' a partir do ID base: {self.numero_base}")
-        
-        self._executar_fase('para_cima', id_inicial_para_cima, id_maximo)
+        lacunas_acima = database.obter_lacunas(self.numero_base, id_maximo)
+        if not lacunas_acima:
+            print(f"Faixa 'para cima' ({self.numero_base} a {id_maximo}) já varrida por completo.")
+        for inicio, fim in lacunas_acima:
+            print(f"Varrendo lacuna 'para cima': {inicio} a {fim}")
+            self._executar_fase('para_cima', inicio, fim, buscar_fronteira=(fim == id_maximo))
 
         print("Scraping concluído.")
 
+    def varrer_faixa(self, id_inicio, id_fim):
+        """
+        Varre em ordem crescente apenas as lacunas ainda não varridas de [id_inicio, id_fim].
+        Usado pelos modos que distribuem o espaço de IDs em lotes.
+        """
+        for inicio, fim in database.obter_lacunas(id_inicio, id_fim):
+            self._executar_fase('para_cima', inicio, fim)
+
     def scraping_extension(self, patient_id: str, name: str, exam_date: date | None, patient_dob: date | None):
         """
         Função para realizar scraping completo utilizando a extensão.
+        As decisões são tomadas sobre o snapshot do painel (painel.capturar_estado).
         """
         try:
             # Voltar ao conteúdo principal
             self.driver.switch_to.default_content()
-            shadow_host = self.driver.find_element(By.ID, "voiston-container-script")
-            # Acessa o Shadow Root do Shadow Host
-            shadow_root = shadow_host.shadow_root
-            # Localiza o conteúdo dentro do Shadow Root
-            shadow_content = shadow_root.find_element(By.ID, "voiston-content-base")
-            
-            try:
-                exist_paciente = WebDriverWait(shadow_content, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.gWsYQM.Scrollable.MuiBox-root > div > div.sc-bczRLJ.fEJldt.MuiBox-root > span"))
-                )
-                text = exist_paciente.text.strip()
-
-                if text == "Paciente não encontrado no Vöiston":
-                    print(f"Paciente {patient_id} não encontrado na extensão.")
-                    button = WebDriverWait(shadow_content, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.eXQUmS.MuiBox-root > div > button"))
-                    )
-                    print("Iniciando envio de paciente para a Vöiston")
-                    time.sleep(1)
-                    button.click()
-                    time.sleep(2)
-                    self.click_image("img/ok.png")  # Clica na imagem de confirmação
-                    self.import_prontuaros_exames(patient_id, name, exam_date, patient_dob)  # Chama a função para importar exames
+
+            # Resolve assim que o painel mostrar o paciente ou a mensagem de não encontrado
+            # No modo pipeline a aba foi carregada em segundo plano: espera o painel mostrar
+            # este paciente, e não o último que a extensão exibiu
+            estado = None
+            if self.pipeline:
+                estado = painel.aguardar_estado(self.driver, 'paciente_atual', timeout=15, nome_esperado=name)
+                if estado is None or estado['condicao'] is None:
+                    # Painel não confirmou o paciente: recarrega em primeiro plano e confia no
+                    # painel recém-montado, como no modo sem pipeline
+                    print(f"Painel não confirmou o paciente {patient_id}; recarregando a página.")
+                    self.driver.refresh()
+                    estado = None
+            if estado is None:
+                estado = painel.aguardar_estado(self.driver, ['paciente_nao_encontrado', 'paciente_encontrado'], timeout=15)
+            if estado is None or estado['condicao'] is None:
+                logging.error(f"Erro ao verificar se o paciente {patient_id} existe: painel da extensão não respondeu.")
+                return
+
+            if estado['paciente_nao_encontrado']:
+                print(f"Paciente {patient_id} não encontrado na extensão.")
+                if not estado['botao_importar']:
+                    estado = painel.aguardar_estado(self.driver, 'botao_importar', timeout=10)
+                if not estado or not estado['botao_importar'] or not painel.clicar_importar(self.driver):
+                    self.add_error("Botão de envio do paciente não encontrado na extensão.", patient_id)
                     return
-            except Exception:
-                print(f"Paciente ja encontrado no Vöiston")
+                print("Iniciando envio de paciente para a Vöiston")
+                self.confirmar_importacao()
+                with self._medir_etapa('import_prontuaros_exames', patient_id):
+                    self.import_prontuaros_exames(patient_id, name, exam_date, patient_dob)  # Chama a função para importar exames
+                return
 
-            try:
-                name_paciente = WebDriverWait(shadow_content, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.gWsYQM.Scrollable.MuiBox-root > div > div:nth-child(1) > div > div > button"))
-                )
-                name_paciente.text.strip()
-                print(f"Paciente {patient_id} já existe na extensão. Checando exames para importação.")
+            print(f"Paciente {patient_id} já existe na extensão. Checando exames para importação.")
+            with self._medir_etapa('import_prontuaros_exames', patient_id):
                 self.import_prontuaros_exames(patient_id, name, exam_date, patient_dob)  # Chama a função para importar exames
-            except Exception as e:
-                logging.exception(f"Erro ao verificar se o paciente existe: {e}")
 
         except Exception as e:
             self.add_error(f"Erro ao realizar scraping da extensão: {e}", patient_id)
 
     def import_prontuaros_exames(self, patient_id: str, name: str, exam_date: date | None, patient_dob: date | None):
         try:
-            shadow_host = self.driver.find_element(By.ID, "voiston-container-script")
-            shadow_root = shadow_host.shadow_root
-            shadow_content = shadow_root.find_element(By.ID, "voiston-content-base")
+            estado = painel.aguardar_estado(self.driver, 'contagem_novos', timeout=15)
+            novos_exames = estado['novos_exames'] if estado else None
+
+            if novos_exames is None:
+                if estado is None or estado['exames_voiston'] is None:
+                    estado = painel.aguardar_estado(self.driver, 'contagem_voiston', timeout=10)
+                if estado and estado['exames_voiston']:
+                    print(f"Ja ha para o paciente {patient_id}, {estado['exames_voiston']} exames na voiston")
+                    return
+                print(f"Nao a novos exames para o paciente {patient_id}")
 
-            try:
-                time.sleep(2)
-                timeout = 15
-                interval = 2
-                start_time = time.time()
-
-                while time.time() - start_time < timeout:
-
-                    try:
-                        check_exames = WebDriverWait(shadow_content, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.gWsYQM.Scrollable.MuiBox-root > div > div.sc-bczRLJ.kaYPDH.MuiBox-root > div.sc-bczRLJ.cRjjBs.MuiBox-root > div > button > p"))
-                        )
-                        print("Elemento encontrado")
-                        break
-                    except Exception:
-                        print("Elemento não encontrado, tentando novamente...")
-                        time.sleep(interval)
+            elif novos_exames <= 0:
+                print(f"Paciente {patient_id} não possui novos exames.")
+                return
 
+            else:
+                print(f"Paciente {patient_id} possui novos exames.")
+                if not estado['botao_importar']:
+                    estado = painel.aguardar_estado(self.driver, 'botao_importar', timeout=15)
+                if not estado or not estado['botao_importar'] or not painel.clicar_importar(self.driver):
+                    print("Tempo limite atingido. O Button I não foi encontrado.")
                 else:
-                    check_exames_voiston = WebDriverWait(shadow_content, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.gWsYQM.Scrollable.MuiBox-root > div > div.sc-bczRLJ.kaYPDH.MuiBox-root > div.sc-bczRLJ.EZEsk.MuiBox-root > div:nth-child(2) > button > p"))
-                    )
-    
-                    if check_exames_voiston:
-                        text_voiston = check_exames_voiston.text.strip()
-                        if int (text_voiston) > 0:
-                            print(f"Ja ha para o paciente {patient_id}, {text_voiston} exames na voiston")
-                            return
-                time.sleep(2)
-                timeout = 15
-                interval = 2
-                start_time = time.time()
-
-                while time.time() - start_time < timeout:
-
-                    try:
-                        button = WebDriverWait(shadow_content, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.eXQUmS.MuiBox-root > div > button"))
-                    )
-                        print("Button I encontrado")
-                        break
-                    except Exception:
-                        print("Button I não encontrado, tentando novamente...")
-                        time.sleep(interval)
+                    self.confirmar_importacao()
+                    estado = painel.aguardar_estado(self.driver, 'botao_importar', timeout=15)
+                    if estado and estado['condicao']:
+                        print("Exames carregados com sucesso !")
+                    else:
+                        print("Tempo limite atingido.")
 
-                else:
-                    print("Tempo limite atingido. O Button I não foi encontrado.")
-                text = check_exames.text.strip()
+            if estado is None or estado['exames_voiston'] is None:
+                estado = painel.aguardar_estado(self.driver, 'contagem_voiston', timeout=10)
+            if estado is None or estado['exames_voiston'] is None:
+                self.add_not_found_patient(patient_id, name, patient_dob, exam_date,"Erro ao verificar exames na Vöiston")
+                return
 
-                if int(text) <= 0:
-                    print(f"Paciente {patient_id} não possui novos exames.")
+            if estado['exames_voiston'] <= 0:
+                print(f"Paciente {patient_id} não possui exames na voiston.")
+                if not painel.clicar_importar(self.driver):
+                    self.add_not_found_patient(patient_id, name, patient_dob, exam_date,"Erro ao verificar exames na Vöiston")
                     return
-                
-                elif int (text) > 0:
-                    print(f"Paciente {patient_id} possui novos exames.")
-                    button = WebDriverWait(shadow_content, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.eXQUmS.MuiBox-root > div > button"))
-                    )
-                    button.click()
-                    time.sleep(2)
-                    self.click_image("img/ok.png")
-                time.sleep(2)
-                timeout = 15
-                interval = 2
-                start_time = time.time()
-
-                while time.time() - start_time < timeout:
-
-                    try:
-                        
-                        button = WebDriverWait(shadow_content, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.eXQUmS.MuiBox-root > div > button"))
-                    )
-                        print("Exames carregados com sucesso !")
-                        break
-                    except Exception:
-                        print("Carregando exames...")
-                        time.sleep(interval)
+                self.confirmar_importacao()
 
+                estado = painel.aguardar_estado(self.driver, 'progresso_completo', timeout=15)
+                if estado is None or estado['condicao'] is None:
+                    print("Tempo limite atingido. O Button II não foi encontrado.")
+                elif not estado['botao_importar']:
+                    print("Botão de progresso desapareceu")
                 else:
-                    print("Tempo limite atingido.")
-                
-            except:
-                print(f"Nao a novos exames para o paciente {patient_id}")
-
-            try:    
-                check_exames_voiston = WebDriverWait(shadow_content, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.gWsYQM.Scrollable.MuiBox-root > div > div.sc-bczRLJ.kaYPDH.MuiBox-root > div.sc-bczRLJ.EZEsk.MuiBox-root > div:nth-child(2) > button > p"))
-                )
-                text_voiston = check_exames_voiston.text.strip()
-
-                if int(text_voiston) <= 0:
-                    print(f"Paciente {patient_id} não possui exames na voiston.")
-                    button = WebDriverWait(shadow_content, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.eXQUmS.MuiBox-root > div > button"))
-                    )
-                    button.click()
-                    time.sleep(2)
-                    self.click_image("img/ok.png")
-                    timeout = 15
-                    interval = 2
-                    start_time = time.time()
-
-                    while time.time() - start_time < timeout:
-
-                        try:
-                            if time.time() - start_time > timeout:
-                                print("Tempo limite atingido.")
-                                break
-
-                            try:
-                                time.sleep(1)
-                                progress_btn = shadow_content.find_element(By.CSS_SELECTOR, "#voiston-content-base > div > div > div:nth-child(2) > div > div > div.sc-bczRLJ.eXQUmS.MuiBox-root > div > button")
-                                txt = progress_btn.text.strip().rstrip("%")
-
-                                if txt.isdigit() and int(txt) >= 100:
-                                    print("✅ Progresso atingiu 100%")
-                                    break
-
-                            except NoSuchElementException:
-                                print("Botão de progresso desapareceu")
-                                break
-
-                        except Exception:
-                            print("Button II não encontrado, tentando novamente...")
-                            time.sleep(interval)
-
-                    else:
-                        print("Tempo limite atingido. O Button II não foi encontrado.")
+                    print("✅ Progresso atingiu 100%")
 
-                elif int (text_voiston) > 0:
-                    print(f"Ja ha para o paciente {patient_id}, {text_voiston} exames na voiston")
-
-            except Exception as e:
-                self.add_not_found_patient(patient_id, name, patient_dob, exam_date,"Erro ao verificar exames na Vöiston")
+            else:
+                print(f"Ja ha para o paciente {patient_id}, {estado['exames_voiston']} exames na voiston")
             
         except Exception as e:
             msg = f"Erro ao realizar importação de exames para o paciente {patient_id}: {e}"
             logger.exception(msg, exc_info=False)
             self.add_error(msg)
 
-    def click_image(self, image_path):
-        import pyautogui
-        location = pyautogui.locateCenterOnScreen(image_path,confidence=0.8)
-        if location is not None:
-            pyautogui.click(location)
-        else:
-            print(f'Elemento não encontrado: {image_path}')
\ No newline at end of file
+    def confirmar_importacao(self):
+        """
+        Confirma o diálogo que segue o clique no botão de importação: primeiro pelo
+        WebDriver/DOM/CDP/progresso do painel (painel.confirmar_dialogo) e, só se a importação
+        não for confirmada por nenhum desses meios e o fallback estiver ativo, pela imagem
+        img/ok.png na tela.
+        """
+        meio = painel.confirmar_dialogo(self.driver, timeout=float(self.config_confirmacao.get("timeout", 2)))
+        if meio:
+            logger.debug(f"Diálogo de confirmação aceito via {meio}.")
+            return True
+        if self._fallback_imagem:
+            return self.click_image("img/ok.png")
+        print("Diálogo de confirmação não encontrado.")
+        return False
+
+    def click_image(self, image_path, timeout=5):
+        """
+        Clica na imagem assim que ela aparecer na tela (substitui a espera fixa antes do clique).
+        """
+        if not click_image(image_path, timeout=timeout):
+            print(f'Elemento não encontrado: {image_path}')
+            return False
+        return True
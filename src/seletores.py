@@ -0,0 +1,113 @@
+import os
+import time
+import yaml
+import logging
+from contextlib import contextmanager
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import StaleElementReferenceException
+from utils.config import carregar_config
+
+logger = logging.getLogger(__name__)
+
+SELETORES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "seletores.yaml")
+
+_seletores_cache = None
+# Arquivo de onde o registro foi lido (o padrão ou o 'selectors_file' do config.yaml)
+_seletores_caminho = SELETORES_FILE
+
+# Tempo acumulado por seletor: nome -> [chamadas, total, máximo]
+_tempos = {}
+
+def carregar_seletores():
+    """
+    Lê o registro de seletores (seletores.yaml ou o caminho em 'selectors_file' do config.yaml)
+    uma única vez e o mantém em cache.
+    """
+    global _seletores_cache, _seletores_caminho
+    if _seletores_cache is None:
+        caminho = carregar_config().get("selectors_file") or SELETORES_FILE
+        if not os.path.isabs(caminho):
+            caminho = os.path.join(os.path.dirname(SELETORES_FILE), caminho)
+        with open(caminho, "r", encoding="utf-8") as f:
+            _seletores_cache = yaml.safe_load(f) or {}
+        _seletores_caminho = caminho
+    return _seletores_cache
+
+def grupo(nome):
+    """
+    Retorna um grupo de seletores (ex.: 'painel', 'pagina') como dicionário.
+    """
+    return carregar_seletores().get(nome) or {}
+
+def seletor(nome_grupo, nome):
+    """
+    Retorna um seletor do registro. Lança KeyError se ele não estiver definido.
+    """
+    valor = grupo(nome_grupo).get(nome)
+    if valor is None:
+        raise KeyError(f"Seletor '{nome_grupo}.{nome}' não definido em {_seletores_caminho}")
+    return valor
+
+@contextmanager
+def medir(nome):
+    """
+    Acumula o tempo gasto em uma busca de elemento sob o nome informado.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        estatistica = _tempos.setdefault(nome, [0, 0.0, 0.0])
+        estatistica[0] += 1
+        estatistica[1] += duracao
+        estatistica[2] = max(estatistica[2], duracao)
+
+def relatorio_tempos():
+    """
+    Retorna as linhas do relatório de tempo por seletor, ordenadas pelo tempo total.
+    """
+    linhas = []
+    for nome, (chamadas, total, maximo) in sorted(_tempos.items(), key=lambda item: item[1][1], reverse=True):
+        linhas.append(
+            f"{nome}: {chamadas} chamada(s), total {total:.2f}s, média {total / chamadas:.3f}s, máximo {maximo:.2f}s"
+        )
+    return linhas
+
+class PainelExtensao:
+    """
+    Handle do conteúdo do Shadow DOM da extensão, resolvido uma vez e reaproveitado
+    até ficar obsoleto (StaleElementReferenceException), quando é resolvido de novo.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._conteudo = None
+
+    def invalidar(self):
+        self._conteudo = None
+
+    def conteudo(self):
+        if self._conteudo is None:
+            with medir("extensao.conteudo"):
+                shadow_host = self.driver.find_element(By.ID, seletor("extensao", "host"))
+                self._conteudo = shadow_host.shadow_root.find_element(By.ID, seletor("extensao", "conteudo"))
+        return self._conteudo
+
+    def encontrar(self, nome, timeout=10, clicavel=False):
+        """
+        Aguarda um elemento do grupo 'painel' dentro do Shadow DOM e o retorna.
+        """
+        condicao = EC.element_to_be_clickable if clicavel else EC.presence_of_element_located
+        localizador = (By.CSS_SELECTOR, seletor("painel", nome))
+        with medir(f"painel.{nome}"):
+            for tentativa in range(2):
+                try:
+                    return WebDriverWait(self.conteudo(), timeout).until(condicao(localizador))
+                except StaleElementReferenceException:
+                    if tentativa:
+                        raise
+                    logger.info("Handle do painel da extensão obsoleto. Resolvendo novamente.")
+                    self.invalidar()
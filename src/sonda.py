@@ -0,0 +1,112 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+import seletores
+from utils.helpers import find_date_in_text
+
+logger = logging.getLogger(__name__)
+
+class SondaHttp:
+    """
+    Verifica por HTTP (sem renderizar a página) se um ID de paciente está em branco,
+    reaproveitando os cookies da sessão do Selenium em um requests.Session com pool de conexões.
+    """
+
+    def __init__(self, url_base, cookies=None, user_agent=None, concorrencia=8, timeout=10):
+        self.url_base = url_base
+        self.concorrencia = max(1, concorrencia)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.concorrencia, pool_maxsize=self.concorrencia)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+        self.atualizar_cookies(cookies or [])
+
+    @classmethod
+    def a_partir_do_driver(cls, driver, url_base, **kwargs):
+        """
+        Cria a sonda copiando os cookies e o User-Agent da sessão atual do navegador.
+        """
+        user_agent = driver.execute_script("return navigator.userAgent")
+        return cls(url_base, driver.get_cookies(), user_agent=user_agent, **kwargs)
+
+    def atualizar_cookies(self, cookies):
+        """
+        Copia para a sessão HTTP uma lista de cookies no formato de driver.get_cookies().
+        """
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain"), path=cookie.get("path", "/")
+            )
+
+    @staticmethod
+    def classificar_html(html):
+        """
+        Lê do HTML bruto os mesmos campos usados por Scraper.validate_patient.
+        Retorna True (paciente preenchido), False (em branco) ou None quando os campos
+        não estão na página (ex.: sessão expirada) e a decisão deve ficar com o navegador.
+        """
+        soup = BeautifulSoup(html, "html.parser")
+        nome_input = soup.find(id=seletores.seletor("pagina", "campo_nome"))
+        idade_div = soup.find(id=seletores.seletor("pagina", "campo_idade"))
+        if nome_input is None or idade_div is None:
+            return None
+        nome_paciente = (nome_input.get("value") or "").strip()
+        idade_texto = idade_div.get_text().strip()
+        return not (not nome_paciente and idade_texto == "0m 0d")
+
+    @staticmethod
+    def extrair_data(html):
+        """
+        Lê do HTML bruto a data de referência do paciente (campo 'pagina.campo_data').
+        Retorna None se o campo não estiver configurado, não existir ou não tiver uma data.
+        """
+        id_campo = seletores.grupo("pagina").get("campo_data")
+        if not id_campo:
+            return None
+        campo = BeautifulSoup(html, "html.parser").find(id=id_campo)
+        if campo is None:
+            return None
+        return find_date_in_text(campo.get("value") or campo.get_text())
+
+    def data_paciente(self, id_paciente):
+        """
+        Busca LINK_BASE + id e retorna a data de referência do paciente, False se a página
+        estiver em branco ou None quando não foi possível ler uma data.
+        """
+        try:
+            resposta = self.session.get(f"{self.url_base}{id_paciente}", timeout=self.timeout)
+            resposta.raise_for_status()
+            if self.classificar_html(resposta.text) is False:
+                return False
+            return self.extrair_data(resposta.text)
+        except Exception as e:
+            logger.warning(f"Sonda HTTP falhou ao ler a data do ID {id_paciente}: {e}")
+            return None
+
+    def sondar(self, id_paciente):
+        """
+        Busca LINK_BASE + id e classifica a página. Retorna None em caso de erro HTTP.
+        """
+        try:
+            resposta = self.session.get(f"{self.url_base}{id_paciente}", timeout=self.timeout)
+            resposta.raise_for_status()
+            return self.classificar_html(resposta.text)
+        except Exception as e:
+            logger.warning(f"Sonda HTTP falhou para o ID {id_paciente}: {e}")
+            return None
+
+    def sondar_varios(self, ids):
+        """
+        Sonda vários IDs em paralelo. Retorna um dicionário {id: True | False | None}.
+        """
+        with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+            return dict(zip(ids, executor.map(self.sondar, ids)))
+
+    def fechar(self):
+        self.session.close()
@@ -0,0 +1,145 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from browser import Browser
+from scraper import Scraper, ReciclarNavegador
+from utils.config import obter_secao
+
+logger = logging.getLogger(__name__)
+
+@contextmanager
+def vigiar_travamento(browser, scraper, prazo, intervalo, ao_travar=None):
+    """
+    Enquanto o bloco executa, uma thread encerra o Chrome à força se scraper.ultimo_progresso
+    ficar mais de prazo segundos sem mudar (verificado a cada intervalo segundos).
+    """
+    parar = threading.Event()
+
+    def vigiar():
+        while not parar.wait(intervalo):
+            parado_ha = time.monotonic() - scraper.ultimo_progresso
+            if parado_ha > prazo:
+                logger.error(f"Navegador sem resposta há {parado_ha:.0f}s. Encerrando o Chrome.")
+                if ao_travar:
+                    ao_travar()
+                browser.encerrar_forcado()
+                return
+
+    thread = threading.Thread(target=vigiar, name="watchdog-navegador", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        thread.join()
+
+class Supervisor:
+    """
+    Executa o scraping dentro de um watchdog. Se o navegador travar (nenhum progresso do
+    scraper dentro do prazo) ou morrer (sessão/renderer perdidos), o Chrome é encerrado,
+    uma nova sessão é aberta com login no portal e na extensão e o scraping recomeça.
+    A retomada parte das lacunas gravadas no banco, ou seja, do último ID confirmado.
+    """
+
+    def __init__(self, summary, browser=None, manter_aberto=False, janela_datas=None):
+        self.summary = summary
+        self.janela_datas = janela_datas
+        # Navegador aberto por uma execução anterior (modo agendado) e se o deste deve ficar aberto
+        self._navegador_aquecido = browser
+        self.manter_aberto = manter_aberto
+        config = obter_secao("watchdog")
+        self.habilitado = bool(config.get("enabled", True))
+        self.prazo_travamento = float(config.get("stall_seconds", 180))
+        self.intervalo_verificacao = float(config.get("check_seconds", 5))
+        self.max_reinicios = int(config.get("max_restarts", 5)) if self.habilitado else 0
+        self.reinicios = 0
+        self.reciclagens = 0
+        self.tempo_parado = 0.0
+        self.browser = None
+        self.scraper = None
+        self._travou = False
+
+    @contextmanager
+    def _vigiar(self):
+        """
+        Mantém uma thread que encerra o Chrome à força quando o scraper fica mais de
+        stall_seconds sem progredir, fazendo a chamada presa ao WebDriver falhar.
+        """
+        if not self.habilitado:
+            yield
+            return
+
+        def ao_travar():
+            self._travou = True
+
+        with vigiar_travamento(self.browser, self.scraper, self.prazo_travamento,
+                               self.intervalo_verificacao, ao_travar):
+            yield
+
+    def _coletar_resumo(self):
+        if self.scraper:
+            self.summary["captured"].extend(self.scraper.captured)
+            self.summary["errors"].extend(self.scraper.errors)
+            self.scraper.captured.clear()
+            self.scraper.errors.clear()
+        if self.browser:
+            self.summary["errors"].extend(self.browser.errors)
+            self.browser.errors.clear()
+
+    def executar(self):
+        """
+        Abre a sessão e roda Scraper.iniciar_scraping até concluir, reiniciando o navegador
+        a cada falha até watchdog.max_restarts vezes. Um pedido de reciclagem (limites de
+        memória do navegador) abre uma sessão nova sem contar como falha. Com manter_aberto,
+        o navegador de uma execução concluída fica em self.browser para ser reaproveitado
+        na próxima. Grava 'restarts', 'downtime_seconds' e 'recycles' no resumo.
+        """
+        parado_desde = None
+        try:
+            while True:
+                self._travou = False
+                self.scraper = None
+                concluido = False
+                try:
+                    if self._navegador_aquecido is not None:
+                        self.browser, self._navegador_aquecido = self._navegador_aquecido, None
+                        self.browser.retomar_sessao()
+                    else:
+                        self.browser = Browser()
+                        self.browser.iniciar_sessao()
+                    self.scraper = Scraper(self.browser.driver, run_id=self.summary.get("run_id"))
+                    self.scraper.ao_criar_aba = self.browser.aplicar_perfil_enxuto
+                    if parado_desde is not None:
+                        self.tempo_parado += time.monotonic() - parado_desde
+                        parado_desde = None
+                        print("Sessão restabelecida. Retomando a partir das lacunas ainda não varridas.")
+                    with self._vigiar():
+                        self.scraper.iniciar_scraping(self.janela_datas)
+                    concluido = True
+                    return
+                except ReciclarNavegador as e:
+                    # Troca planejada: não conta como falha nem como tempo parado
+                    self.reciclagens += 1
+                    print(f"Reciclando o navegador ({self.reciclagens}ª vez): {e}")
+                except Exception as e:
+                    causa = "travamento do navegador" if self._travou else str(e)
+                    if self.reinicios >= self.max_reinicios:
+                        raise
+                    self.reinicios += 1
+                    if parado_desde is None:
+                        parado_desde = time.monotonic()
+                    msg = f"Reiniciando o navegador ({self.reinicios}/{self.max_reinicios}) após falha: {causa}"
+                    logger.error(msg)
+                    self.summary["errors"].append(msg)
+                finally:
+                    self._coletar_resumo()
+                    if self.browser and not (concluido and self.manter_aberto):
+                        self.browser.fechar_navegador()
+                        self.browser = None
+        finally:
+            if parado_desde is not None:
+                self.tempo_parado += time.monotonic() - parado_desde
+            self.summary["restarts"] = self.reinicios
+            self.summary["downtime_seconds"] = round(self.tempo_parado, 1)
+            self.summary["recycles"] = self.reciclagens
@@ -0,0 +1,34 @@
+import os
+import yaml
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "config.yaml")
+
+_config_cache = None
+
+def carregar_config():
+    """
+    Lê o arquivo config.yaml da raiz do projeto uma única vez e mantém o resultado em cache.
+    Retorna um dicionário vazio se o arquivo não existir ou estiver inválido.
+    """
+    global _config_cache
+    if _config_cache is None:
+        try:
+            with open(CONFIG_FILE, "r") as f:
+                _config_cache = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            logger.warning(f"Arquivo '{CONFIG_FILE}' não encontrado. Usando valores padrão.")
+            _config_cache = {}
+        except Exception as e:
+            logger.error(f"Erro ao ler '{CONFIG_FILE}': {e}. Usando valores padrão.")
+            _config_cache = {}
+    return _config_cache
+
+def obter_secao(nome):
+    """
+    Retorna uma seção do config.yaml como dicionário (vazio se ausente).
+    """
+    secao = carregar_config().get(nome)
+    return secao if isinstance(secao, dict) else {}
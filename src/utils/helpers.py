@@ -1,14 +1,14 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, NoSuchWindowException
 import time
 import sys
 from datetime import datetime, date
 from typing import Optional, Union
 import datetime
-import pyautogui
 import os
+import re
 import time
 
 # Gera o nome do arquivo de log
@@ -164,6 +164,101 @@ def click_element(driver, identifier, identifier_type, action_name="", timeout=2
         time.sleep(1)
         print(f" Ação '{action_name}' concluída em {execution_time:.2f} segundos.")
 
+def _reportar_latencia(action_name, execution_time, budget):
+    """
+    Exibe a latência de uma interação rápida e avisa quando ela estoura o orçamento.
+    """
+    if budget is not None and execution_time > budget:
+        print(f" AVISO: Ação '{action_name}' levou {execution_time:.2f}s, acima do orçamento de {budget:.2f}s.")
+    else:
+        print(f" Ação '{action_name}' concluída em {execution_time:.2f} segundos.")
+
+def fast_fill_field(driver, identifier, identifier_type, value, action_name="", timeout=30, budget=None, poll=0.05):
+    """
+    Versão rápida de fill_field: uma única espera (elemento presente, visível e habilitado)
+    e, no lugar das pausas fixas, a confirmação de que o campo ficou com o valor digitado.
+
+    Parâmetros:
+    - driver, identifier, identifier_type, value, action_name, timeout: como em fill_field.
+    - budget (float, opcional): Orçamento de latência em segundos; estouros são avisados no log.
+    - poll (float, opcional): Intervalo entre as verificações das esperas.
+
+    Retorno:
+    - True se o campo ficou com o valor informado, False caso contrário.
+    """
+    start_time = time.time()
+    try:
+        if not isinstance(value, str):
+            raise ValueError(f" Esperado um valor de texto (string), mas recebeu {type(value).__name__}")
+        if identifier_type not in by_type:
+            raise ValueError(f" Tipo de identificador '{identifier_type}' não é suportado.")
+
+        wait = WebDriverWait(driver, timeout, poll_frequency=poll)
+        element = wait.until(EC.element_to_be_clickable((by_type[identifier_type], identifier)))
+
+        for _ in range(2):
+            element.clear()
+            element.send_keys(value)
+            try:
+                WebDriverWait(driver, 2, poll_frequency=poll).until(
+                    lambda d: element.get_attribute("value") == value
+                )
+                return True
+            except TimeoutException:
+                # Campo reinicializado pela página durante a digitação: tenta mais uma vez
+                continue
+        print(f" Erro: O campo com {identifier_type} '{identifier}' não ficou com o valor informado.")
+        return False
+
+    except TimeoutException:
+        print(f" Erro: O elemento com {identifier_type} '{identifier}' não foi encontrado após {timeout} segundos.")
+    except ValueError as ve:
+        print(f" Erro de valor: {ve}")
+    except Exception as e:
+        print(f" Ocorreu um erro inesperado: {e}")
+    finally:
+        _reportar_latencia(action_name, time.time() - start_time, budget)
+    return False
+
+def fast_click_element(driver, identifier, identifier_type, action_name="", timeout=20, budget=None,
+                       navigation_timeout=0, poll=0.05):
+    """
+    Versão rápida de click_element: clica assim que o elemento estiver clicável, sem pausas fixas.
+
+    Parâmetros:
+    - driver, identifier, identifier_type, action_name, timeout: como em click_element.
+    - budget (float, opcional): Orçamento de latência em segundos; estouros são avisados no log.
+    - navigation_timeout (float, opcional): Se maior que zero, aguarda até esse tempo o elemento
+      sair do DOM (página trocada pelo clique) em vez de uma pausa fixa após o clique.
+    - poll (float, opcional): Intervalo entre as verificações das esperas.
+
+    Retorno:
+    - True se o clique foi feito, False caso contrário.
+    """
+    start_time = time.time()
+    try:
+        if identifier_type not in by_type:
+            raise ValueError(f"Tipo de identificador '{identifier_type}' não é suportado.")
+
+        wait = WebDriverWait(driver, timeout, poll_frequency=poll)
+        element = wait.until(EC.element_to_be_clickable((by_type[identifier_type], identifier)))
+        element.click()
+    except TimeoutException:
+        print(f" Erro: O elemento com {identifier_type} '{identifier}' não foi encontrado após {timeout} segundos.")
+        return False
+    except Exception as e:
+        print(f" Erro inesperado: {e}")
+        return False
+    finally:
+        _reportar_latencia(action_name, time.time() - start_time, budget)
+
+    if navigation_timeout > 0:
+        try:
+            WebDriverWait(driver, navigation_timeout, poll_frequency=poll).until(EC.staleness_of(element))
+        except TimeoutException:
+            print(f" AVISO: A página não mudou em {navigation_timeout}s após '{action_name}'.")
+    return True
+
 def check_text_on_page(driver, text, timeout, check_interval=5):
     """
     Verifica continuamente se um texto específico ainda está presente na página.
@@ -204,6 +299,61 @@ def check_text_on_page(driver, text, timeout, check_interval=5):
         # Aguarda o intervalo definido antes de verificar novamente
         time.sleep(check_interval)
 
+# Resolve assim que o texto sumir do container (ou do documento), observando mutações do DOM.
+# Resolve com false se o texto continuar presente ao fim de arguments[2] ms.
+_SCRIPT_AGUARDAR_SUMIR = """
+const [texto, seletorContainer, timeoutMs, concluir] = arguments;
+const raiz = () => (seletorContainer && document.querySelector(seletorContainer)) || document.body;
+const presente = () => { const r = raiz(); return !!r && r.textContent.includes(texto); };
+if (!presente()) { concluir(true); return; }
+let agendado = false;
+const observador = new MutationObserver(() => {
+    if (agendado) return;
+    agendado = true;
+    // Agrupa as mutações de um mesmo ciclo em uma única verificação
+    setTimeout(() => {
+        agendado = false;
+        if (!presente()) { observador.disconnect(); clearTimeout(limite); concluir(true); }
+    }, 0);
+});
+observador.observe(document.documentElement, {subtree: true, childList: true, characterData: true});
+const limite = setTimeout(() => { observador.disconnect(); concluir(!presente()); }, timeoutMs);
+"""
+
+def wait_text_disappear(driver, text, timeout, container=None, chunk=20):
+    """
+    Aguarda um texto sumir da página, sem polling: o navegador avisa assim que uma
+    mutação do DOM remove o texto.
+
+    Parâmetros:
+    - driver (WebDriver): Instância do Selenium WebDriver.
+    - text (str): Texto que deve desaparecer.
+    - timeout (float): Tempo máximo de espera em segundos.
+    - container (str, opcional): Seletor CSS que restringe onde o texto é procurado.
+    - chunk (float, opcional): Duração máxima de cada espera assíncrona, abaixo do script timeout.
+
+    Retorno:
+    - True se o texto desapareceu (ou a janela foi fechada), False se o tempo limite foi atingido.
+    """
+    start_time = time.time()
+    print(f" Aguardando o texto '{text}' desaparecer...")
+    while True:
+        restante = timeout - (time.time() - start_time)
+        if restante <= 0:
+            print(f" Tempo limite atingido! O texto '{text}' ainda está na página.")
+            return False
+        try:
+            if driver.execute_async_script(_SCRIPT_AGUARDAR_SUMIR, text, container, int(min(restante, chunk) * 1000)):
+                print(f" O texto '{text}' desapareceu da página em {time.time() - start_time:.2f} segundos.")
+                return True
+        except NoSuchWindowException:
+            print(f" A janela foi fechada enquanto o texto '{text}' era aguardado.")
+            return True
+        except Exception as e:
+            # Navegação durante a espera descarta o script: tenta de novo na página nova
+            print(f" Espera pelo texto '{text}' interrompida ({type(e).__name__}). Tentando novamente.")
+            time.sleep(0.1)
+
 by_type = {
                 'id': By.ID,
                 'xpath': By.XPATH,
@@ -318,7 +468,10 @@ def parse_date_safe(value: Optional[Union[str, datetime.datetime, datetime.date]
     return None
 
 def click_image(image_path, confidence=0.8, timeout=10):
-    
+    # Importado aqui: pyautogui exige um display, e o modo headless não usa este caminho
+    import pyautogui
+    from utils.localizador import obter_localizador
+
     # Se o caminho for relativo, torna absoluto baseado no diretório /app
     if not os.path.isabs(image_path):
         image_path = os.path.join('/app', image_path)
@@ -330,19 +483,33 @@ def click_image(image_path, confidence=0.8, timeout=10):
         print(f"ERRO: Arquivo de imagem não encontrado: {image_path}")
         return False
     
-    # Tenta localizar a imagem na tela com retry
+    # Tenta localizar a imagem na tela com retry (template em cache, captura só da região de interesse)
+    localizador = obter_localizador()
     start_time = time.time()
     while time.time() - start_time < timeout:
         try:
-            location = pyautogui.locateCenterOnScreen(image_path, confidence=confidence)
+            location = localizador.localizar(image_path, confidence)
             if location is not None:
                 print(f"Imagem encontrada em: {location}")
-                pyautogui.click(location)
+                pyautogui.click(*location)
                 return True
         except Exception as e:
             print(f"Erro ao procurar imagem: {e}")
         
-        time.sleep(0.5)
+        time.sleep(0.2)
     
     print(f"Elemento não encontrado após {timeout}s: {image_path}")
-    return False
\ No newline at end of file
+    return False
+
+def find_date_in_text(text: Optional[str]) -> Optional[datetime.date]:
+    """
+    Procura a primeira data (dd/mm/yyyy, yyyy-mm-dd ou dd-mm-yyyy) em um texto,
+    ignorando o que vier em volta (ex.: hora do atendimento).
+
+    Returns:
+        datetime.date ou None se não houver data no texto
+    """
+    if not text:
+        return None
+    encontrada = re.search(r"\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2}|\d{2}-\d{2}-\d{4}", text)
+    return parse_date_safe(encontrada.group(0)) if encontrada else None
@@ -0,0 +1,141 @@
+import os
+import logging
+import cv2
+import numpy as np
+from utils.config import obter_secao
+
+logger = logging.getLogger(__name__)
+
+class LocalizadorImagens:
+    """
+    Localiza imagens de referência na tela com OpenCV.
+
+    Os templates são lidos e convertidos para tons de cinza uma única vez. Cada busca
+    captura apenas uma região de interesse: primeiro a vizinhança do último acerto do
+    template, depois a região configurada em image_matcher.regions e, só então, a tela
+    inteira. A captura usa o Xlib diretamente (XGetImage) quando há display X.
+    """
+
+    def __init__(self, confianca=0.8, margem=40, regioes=None):
+        self.confianca = confianca
+        self.margem = margem
+        # nome do arquivo -> (x, y, largura, altura)
+        self.regioes = {nome: tuple(regiao) for nome, regiao in (regioes or {}).items()}
+        self._templates = {}
+        self._ultimos_acertos = {}
+        self._display = None
+        self._raiz = None
+        self._tamanho_tela = None
+
+    def _template(self, caminho):
+        template = self._templates.get(caminho)
+        if template is None:
+            template = cv2.imread(caminho, cv2.IMREAD_GRAYSCALE)
+            if template is None:
+                raise FileNotFoundError(f"Imagem de referência não encontrada: {caminho}")
+            self._templates[caminho] = template
+        return template
+
+    def _conectar_display(self):
+        if self._raiz is None:
+            from Xlib import display
+            self._display = display.Display()
+            self._raiz = self._display.screen().root
+            geometria = self._raiz.get_geometry()
+            self._tamanho_tela = (geometria.width, geometria.height)
+        return self._raiz
+
+    def tamanho_tela(self):
+        try:
+            self._conectar_display()
+        except Exception:
+            import pyautogui
+            self._tamanho_tela = tuple(pyautogui.size())
+        return self._tamanho_tela
+
+    def _limitar(self, regiao):
+        """
+        Recorta a região (x, y, largura, altura) aos limites da tela.
+        """
+        largura_tela, altura_tela = self.tamanho_tela()
+        x, y, largura, altura = regiao
+        x, y = max(0, int(x)), max(0, int(y))
+        largura = min(int(largura), largura_tela - x)
+        altura = min(int(altura), altura_tela - y)
+        if largura <= 0 or altura <= 0:
+            return None
+        return (x, y, largura, altura)
+
+    def capturar(self, regiao):
+        """
+        Captura a região da tela e a devolve em tons de cinza (array 2D do numpy).
+        """
+        x, y, largura, altura = regiao
+        try:
+            from Xlib import X
+            raiz = self._conectar_display()
+            imagem = raiz.get_image(x, y, largura, altura, X.ZPixmap, 0xFFFFFFFF)
+            pixels = np.frombuffer(imagem.data, dtype=np.uint8).reshape(altura, largura, 4)
+            return cv2.cvtColor(pixels, cv2.COLOR_BGRA2GRAY)
+        except ImportError:
+            import pyautogui
+            imagem = pyautogui.screenshot(region=regiao)
+            return cv2.cvtColor(np.asarray(imagem), cv2.COLOR_RGB2GRAY)
+
+    def _regioes_candidatas(self, caminho, template):
+        altura, largura = template.shape
+        ultimo = self._ultimos_acertos.get(caminho)
+        if ultimo:
+            x, y = ultimo
+            yield "ultimo_acerto", (x - self.margem, y - self.margem, largura + 2 * self.margem, altura + 2 * self.margem)
+        regiao = self.regioes.get(os.path.basename(caminho))
+        if regiao:
+            yield "regiao_configurada", regiao
+        yield "tela_inteira", (0, 0) + tuple(self.tamanho_tela())
+
+    def localizar(self, caminho, confianca=None):
+        """
+        Procura o template na tela. Retorna o centro (x, y) em coordenadas de tela
+        ou None se a correlação não atingir a confiança mínima em nenhuma região.
+        """
+        template = self._template(caminho)
+        confianca = self.confianca if confianca is None else confianca
+        altura, largura = template.shape
+        for origem, regiao in self._regioes_candidatas(caminho, template):
+            regiao = self._limitar(regiao)
+            if regiao is None or regiao[2] < largura or regiao[3] < altura:
+                continue
+            tela = self.capturar(regiao)
+            resultado = cv2.matchTemplate(tela, template, cv2.TM_CCOEFF_NORMED)
+            _, valor, _, posicao = cv2.minMaxLoc(resultado)
+            if valor >= confianca:
+                x, y = regiao[0] + posicao[0], regiao[1] + posicao[1]
+                self._ultimos_acertos[caminho] = (x, y)
+                logger.debug(f"{caminho} encontrado via {origem} (correlação {valor:.2f})")
+                return (x + largura // 2, y + altura // 2)
+        return None
+
+    def esquecer(self, caminho=None):
+        """
+        Descarta o último acerto de um template (ou de todos), forçando uma nova busca completa.
+        """
+        if caminho is None:
+            self._ultimos_acertos.clear()
+        else:
+            self._ultimos_acertos.pop(caminho, None)
+
+_localizador = None
+
+def obter_localizador():
+    """
+    Retorna o localizador compartilhado, configurado pela seção image_matcher do config.yaml.
+    """
+    global _localizador
+    if _localizador is None:
+        config = obter_secao("image_matcher")
+        _localizador = LocalizadorImagens(
+            confianca=float(config.get("confidence", 0.8)),
+            margem=int(config.get("margin", 40)),
+            regioes=config.get("regions"),
+        )
+    return _localizador
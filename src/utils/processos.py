@@ -0,0 +1,44 @@
+import os
+
+def processos_filhos(pid):
+    """
+    Lista os PIDs dos processos filhos diretos de pid, lendo /proc.
+    """
+    filhos = []
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat", "r") as f:
+                # O nome do processo fica entre parênteses e pode conter espaços
+                campos = f.read().rsplit(")", 1)[1].split()
+            if int(campos[1]) == pid:
+                filhos.append(int(entrada))
+        except (OSError, IndexError, ValueError):
+            continue
+    return filhos
+
+def arvore_processos(pid):
+    """
+    Retorna pid e todos os seus descendentes.
+    """
+    pids = [pid]
+    for atual in pids:
+        pids.extend(processos_filhos(atual))
+    return pids
+
+def rss_mb(pids):
+    """
+    Soma a memória residente (VmRSS) dos processos, em MB. Processos já encerrados são ignorados.
+    """
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for linha in f:
+                    if linha.startswith("VmRSS:"):
+                        total_kb += int(linha.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
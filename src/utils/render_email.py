@@ -14,7 +14,9 @@ env = Environment(
 
 logger = logging.getLogger(__name__)
 
-def render_email(start_dt: str, duration_seconds: str, captured: List[Dict], errors: List[str]) -> str:
+def render_email(start_dt: str, duration_seconds: str, captured: List[Dict], errors: List[str],
+                 restarts: int = 0, downtime: Optional[str] = None,
+                 timings: Optional[List[Dict]] = None) -> str:
     """
     Renderiza template de email simples (original)
     
@@ -23,6 +25,9 @@ def render_email(start_dt: str, duration_seconds: str, captured: List[Dict], err
         duration_seconds: Duração no formato 'HH:MM:SS'
         captured: Lista de dicionários com dados dos pacientes processados
         errors: Lista de mensagens de erro
+        restarts: Quantas vezes o navegador foi reiniciado pelo watchdog
+        downtime: Tempo sem processar por causa dos reinícios, no formato 'HH:MM:SS'
+        timings: Percentis de tempo por etapa (chaves etapa, amostras, p50, p95, p99, em segundos)
         
     Returns:
         str: HTML renderizado
@@ -33,7 +38,10 @@ def render_email(start_dt: str, duration_seconds: str, captured: List[Dict], err
             start_dt=start_dt,
             duration=duration_seconds,
             captured=captured or [],
-            errors=errors or []
+            errors=errors or [],
+            restarts=restarts,
+            downtime=downtime,
+            timings=timings or []
         )
     except Exception as e:
         logger.error(f"Erro ao renderizar template summary.html: {e}")
@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+# Os módulos do projeto são importados a partir de src/, como em "cd src && python main.py"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """
+    Banco SQLite temporário e vazio, com as tabelas criadas.
+    """
+    import database
+
+    database.fechar_banco()
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "pacientes.db"))
+    database.inicializar_banco()
+    yield database
+    database.fechar_banco()
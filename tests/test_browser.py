@@ -0,0 +1,95 @@
+import subprocess
+import time
+import pytest
+import browser as modulo_browser
+from utils import helpers
+from utils.processos import arvore_processos
+from browser import Browser
+
+
+class Janela:
+    def window(self, handle):
+        pass
+
+
+class DriverFalso:
+    current_window_handle = "principal"
+    window_handles = ["principal", "login"]
+    switch_to = Janela()
+
+
+class PainelFalso:
+    def encontrar(self, nome, timeout=10, clicavel=False):
+        return type("Link", (), {"click": lambda self: None})()
+
+
+@pytest.fixture
+def navegador(monkeypatch, tmp_path):
+    monkeypatch.setattr(helpers, "log_filename", str(tmp_path / "testeAutomatico.log"))
+    instancia = Browser.__new__(Browser)
+    instancia.driver = DriverFalso()
+    instancia.painel = PainelFalso()
+    instancia.errors = []
+    instancia.tempos_inicializacao = {}
+    instancia._preencher = lambda *args: True
+    instancia._clicar = lambda *args: True
+    instancia.login = lambda: None
+    monkeypatch.setattr(modulo_browser, "WebDriverWait", lambda *args, **kwargs: type("W", (), {"until": lambda s, c: True})())
+    return instancia
+
+
+def test_timeout_do_login_da_extensao_e_falha_recuperavel(navegador, monkeypatch):
+    monkeypatch.setattr(modulo_browser, "wait_text_disappear", lambda *args, **kwargs: False)
+    # Exception (e não SystemExit): o Supervisor conta a falha e reinicia o navegador
+    with pytest.raises(Exception, match="preparação para scraping"):
+        navegador._autenticar(verificar_sessao=False)
+    assert any("Tempo limite excedido" in erro for erro in navegador.errors)
+
+
+def test_liberar_perfil_preserva_trava_de_chrome_vivo(tmp_path, monkeypatch):
+    monkeypatch.setattr(modulo_browser.socket, "gethostname", lambda: "host")
+    trava = tmp_path / "SingletonLock"
+    trava.symlink_to(f"host-{modulo_browser.os.getpid()}")
+    assert Browser._liberar_perfil(str(tmp_path)) is False
+    assert trava.is_symlink()
+
+
+def test_liberar_perfil_remove_travas_orfas(tmp_path, monkeypatch):
+    monkeypatch.setattr(modulo_browser.socket, "gethostname", lambda: "host")
+    (tmp_path / "SingletonLock").symlink_to("outro-host-123")
+    (tmp_path / "SingletonSocket").symlink_to("/tmp/inexistente")
+    assert Browser._liberar_perfil(str(tmp_path)) is True
+    assert list(tmp_path.iterdir()) == []
+
+
+def _vivo(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def test_encerrar_forcado_mata_a_arvore_inteira():
+    # chromedriver -> Chrome -> renderer: o neto também precisa morrer
+    processo = subprocess.Popen(["sh", "-c", "sh -c 'sleep 60 & wait' & wait"])
+    for _ in range(50):
+        pids = arvore_processos(processo.pid)
+        if len(pids) == 3:
+            break
+        time.sleep(0.05)
+    assert len(pids) == 3
+    instancia = Browser.__new__(Browser)
+    instancia.driver = type("Driver", (), {"service": type("Service", (), {"process": processo})()})()
+    instancia.encerrar_forcado()
+    processo.wait(timeout=5)
+    time.sleep(0.1)
+    assert not any(_vivo(pid) for pid in pids)
+
+
+def test_ready_for_scraping_pula_login_com_extensao_autenticada(navegador, monkeypatch):
+    estado = {"login_extensao": False, "paciente_encontrado": True, "paciente_nao_encontrado": False}
+    monkeypatch.setattr(modulo_browser.painel, "capturar_estado", lambda driver: estado)
+    navegador.painel = None  # encontrar() não pode ser chamado
+    navegador.ready_for_scraping()
+    assert navegador.errors == []
@@ -0,0 +1,94 @@
+import pytest
+from datetime import datetime
+
+
+def test_lote_que_sempre_falha_e_abandonado(banco):
+    banco.criar_lotes_trabalho(1, 100, 100)
+    for tentativa in range(3):
+        assert banco.reivindicar_lote("no-a", 300, 1, max_tentativas=3) == (1, 100)
+        status = banco.finalizar_lote(1, "no-a", concluido=False, max_tentativas=3)
+    assert status == 'falhou'
+    assert banco.reivindicar_lote("no-b", 300, 1, max_tentativas=3) is None
+
+
+def test_lease_expirado_conta_como_tentativa(banco):
+    banco.criar_lotes_trabalho(1, 100, 100)
+    for tentativa in range(2):
+        # Lease de duração negativa: já expirado, como o de um nó que morreu
+        assert banco.reivindicar_lote(f"no-{tentativa}", -1, 1, max_tentativas=2) == (1, 100)
+    assert banco.reivindicar_lote("no-final", 300, 1, max_tentativas=2) is None
+    status = banco.obter_conexao().execute("SELECT status FROM lotes_trabalho WHERE inicio = 1").fetchone()[0]
+    assert status == 'falhou'
+
+
+def test_reciclagem_nao_consome_tentativa(banco):
+    banco.criar_lotes_trabalho(1, 100, 100)
+    for _ in range(5):
+        assert banco.reivindicar_lote("no-a", 300, 1, max_tentativas=2) == (1, 100)
+        assert banco.finalizar_lote(1, "no-a", concluido=False, max_tentativas=2, contar_tentativa=False) == 'pendente'
+    assert banco.reivindicar_lote("no-a", 300, 1, max_tentativas=2) == (1, 100)
+    assert banco.finalizar_lote(1, "no-a", max_tentativas=2) == 'concluido'
+
+
+def _faixas(banco):
+    return banco.obter_conexao().execute("SELECT inicio, fim FROM faixas_varridas ORDER BY inicio").fetchall()
+
+
+def test_faixas_adjacentes_e_sobrepostas_sao_fundidas(banco):
+    banco.registrar_faixa_varrida(10, 20)
+    banco.registrar_faixa_varrida(21, 30)
+    assert _faixas(banco) == [(10, 30)]
+    banco.registrar_faixa_varrida(50, 40)
+    assert _faixas(banco) == [(10, 30), (40, 50)]
+    banco.registrar_faixa_varrida(25, 45)
+    assert _faixas(banco) == [(10, 50)]
+    banco.registrar_faixa_varrida(12, 14)
+    assert _faixas(banco) == [(10, 50)]
+
+
+def test_faixa_separada_por_um_id_nao_e_fundida(banco):
+    banco.registrar_faixa_varrida(1, 5)
+    banco.registrar_faixa_varrida(7, 9)
+    assert _faixas(banco) == [(1, 5), (7, 9)]
+    assert banco.obter_lacunas(1, 9) == [(6, 6)]
+
+
+def test_obter_lacunas(banco):
+    assert banco.obter_lacunas(1, 100) == [(1, 100)]
+    assert banco.obter_lacunas(5, 4) == []
+    banco.registrar_faixa_varrida(1, 10)
+    banco.registrar_faixa_varrida(20, 30)
+    banco.registrar_faixa_varrida(25, 40)
+    assert banco.obter_lacunas(1, 100) == [(11, 19), (41, 100)]
+    assert banco.obter_lacunas(5, 22) == [(11, 19)]
+    assert banco.obter_lacunas(21, 39) == []
+
+
+@pytest.mark.parametrize("valores, percentil, esperado", [
+    ([], 50, None),
+    ([0.7], 50, 0.7),
+    ([0.7], 99, 0.7),
+    ([0.7], 0, 0.7),
+    ([1, 2, 3, 4], 50, 2),
+    ([1, 2, 3, 4], 95, 4),
+    (list(range(1, 101)), 95, 95),
+    (list(range(1, 101)), 99, 99),
+    (list(range(1, 101)), 100, 100),
+])
+def test_percentil_posto_mais_proximo(banco, valores, percentil, esperado):
+    assert banco._percentil(valores, percentil) == esperado
+
+
+def test_percentis_tempos_por_etapa(banco):
+    inicio = datetime(2025, 1, 1, 8, 0, 0)
+    for i in range(1, 21):
+        banco.registrar_tempo("exec-1", "navegacao", i, inicio, i / 10)
+    banco.registrar_tempo("exec-1", "validate_patient", 1, inicio, 5.0)
+    banco.registrar_tempo("exec-2", "navegacao", 1, inicio, 99.0)
+    navegacao, validacao = banco.percentis_tempos("exec-1")
+    assert navegacao["etapa"] == "navegacao"
+    assert navegacao["amostras"] == 20
+    assert navegacao["total"] == pytest.approx(21.0)
+    assert (navegacao["p50"], navegacao["p95"], navegacao["p99"]) == (1.0, 1.9, 2.0)
+    assert validacao == {"etapa": "validate_patient", "amostras": 1, "total": 5.0, "p50": 5.0, "p95": 5.0, "p99": 5.0}
+    assert banco.percentis_tempos("sem-medicoes") == []
@@ -0,0 +1,45 @@
+import pytest
+from intervalos import IndiceIntervalos
+
+
+def test_intervalos_adjacentes_e_sobrepostos_sao_fundidos():
+    indice = IndiceIntervalos([(10, 20), (21, 25), (40, 50), (45, 60), (1, 1)])
+    assert indice.intervalos() == [(1, 1), (10, 25), (40, 60)]
+    indice.adicionar_intervalo(30, 26)
+    assert indice.intervalos() == [(1, 1), (10, 30), (40, 60)]
+    indice.adicionar_intervalo(0, 100)
+    assert indice.intervalos() == [(0, 100)]
+
+
+def test_intervalo_separado_por_um_id_nao_e_fundido():
+    indice = IndiceIntervalos([(1, 5), (7, 9)])
+    assert len(indice) == 2
+    indice.adicionar(6)
+    assert indice.intervalos() == [(1, 9)]
+
+
+@pytest.mark.parametrize("id_valor, esperado", [
+    (0, False), (1, True), (5, True), (6, False), (9, False), (10, True), (20, True), (21, False),
+])
+def test_contem_nas_bordas(id_valor, esperado):
+    indice = IndiceIntervalos([(1, 5), (10, 20)])
+    assert indice.contem(id_valor) is esperado
+
+
+@pytest.mark.parametrize("id_valor, direcao, esperado", [
+    (3, "para_cima", 6),
+    (3, "para_baixo", 0),
+    (15, "para_cima", 21),
+    (15, "para_baixo", 9),
+    (7, "para_cima", 7),
+])
+def test_proximo_fora_salta_o_intervalo(id_valor, direcao, esperado):
+    indice = IndiceIntervalos([(1, 5), (10, 20)])
+    assert indice.proximo_fora(id_valor, direcao) == esperado
+
+
+def test_indice_vazio():
+    indice = IndiceIntervalos()
+    assert len(indice) == 0
+    assert not indice.contem(1)
+    assert indice.proximo_fora(1, "para_cima") == 1
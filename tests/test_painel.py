@@ -0,0 +1,58 @@
+import time
+import pytest
+from selenium.common.exceptions import NoAlertPresentException, WebDriverException
+import painel
+
+
+class SemAlerta:
+    @property
+    def alert(self):
+        raise NoAlertPresentException()
+
+
+class DriverFalso:
+    """
+    Sem alert nem diálogo no DOM. O diálogo CDP aparece na chamada dialogo_cdp e o painel
+    passa a mostrar o progresso na leitura progresso_em.
+    """
+
+    def __init__(self, dialogo_cdp=None, progresso_em=None):
+        self.switch_to = SemAlerta()
+        self.dialogo_cdp = dialogo_cdp
+        self.progresso_em = progresso_em
+        self.chamadas_cdp = 0
+        self.leituras_painel = 0
+
+    def execute_script(self, script, *args):
+        if script == painel._SCRIPT_SNAPSHOT:
+            self.leituras_painel += 1
+            em_andamento = self.progresso_em is not None and self.leituras_painel >= self.progresso_em
+            return {"progresso": 10 if em_andamento else None}
+        return None
+
+    def execute_cdp_cmd(self, comando, parametros):
+        self.chamadas_cdp += 1
+        if self.dialogo_cdp is None or self.chamadas_cdp < self.dialogo_cdp:
+            raise WebDriverException("No dialog is showing")
+        return {}
+
+
+def test_confirmar_dialogo_tenta_cdp_durante_a_espera():
+    driver = DriverFalso(dialogo_cdp=3)
+    inicio = time.monotonic()
+    assert painel.confirmar_dialogo(driver, timeout=5) == "cdp"
+    assert time.monotonic() - inicio < 1
+
+
+def test_confirmar_dialogo_aceita_progresso_do_painel():
+    driver = DriverFalso(progresso_em=2)
+    assert painel.confirmar_dialogo(driver, timeout=5) == "painel"
+
+
+@pytest.mark.parametrize("timeout", [0, 0.3])
+def test_confirmar_dialogo_sem_confirmacao_expira(timeout):
+    driver = DriverFalso()
+    inicio = time.monotonic()
+    assert painel.confirmar_dialogo(driver, timeout=timeout) is None
+    assert time.monotonic() - inicio < timeout + 0.5
+    assert driver.chamadas_cdp >= 1
@@ -0,0 +1,45 @@
+import os
+import pool
+
+
+def worker_que_morre(numero, fila_lotes, fila_resultados, max_tentativas, run_id=None, marcador=None):
+    """
+    Worker falso: quem pegar o lote que começa no ID 1 morre (como num OOM kill) na
+    primeira vez; os demais lotes são concluídos normalmente.
+    """
+    resumo = {"captured": [], "errors": []}
+    while True:
+        lote = fila_lotes.get()
+        if lote is None:
+            break
+        fila_resultados.put(("iniciado", numero, lote, None))
+        if lote[0] == 1 and not os.path.exists(marcador):
+            open(marcador, "w").close()
+            fila_resultados.close()
+            fila_resultados.join_thread()
+            os._exit(9)
+        resumo["captured"].append({"id": lote[0], "name": None, "exam_date": None})
+        fila_resultados.put(("concluido", numero, lote, None))
+    fila_resultados.put(("resumo", numero, None, resumo))
+
+
+def test_lote_de_worker_morto_volta_para_a_fila(banco, monkeypatch, tmp_path):
+    monkeypatch.setenv("ID_MINIMO", "1")
+    monkeypatch.setenv("ID_MAXIMO", "3000")
+    monkeypatch.setenv("ID_BASE", "1")
+    marcador = str(tmp_path / "morreu")
+
+    processo_original = pool.multiprocessing.get_context("spawn").Process
+
+    def processo(target, args, daemon):
+        return processo_original(target=worker_que_morre, args=args + (marcador,), daemon=daemon)
+
+    contexto = pool.multiprocessing.get_context("spawn")
+    monkeypatch.setattr(contexto, "Process", processo)
+    monkeypatch.setattr(pool.multiprocessing, "get_context", lambda metodo: contexto)
+
+    summary = {"run_id": "teste", "captured": [], "errors": []}
+    pool.executar_pool(2, summary)
+
+    assert os.path.exists(marcador)
+    assert sorted(p["id"] for p in summary["captured"]) == [1, 1001, 2001]
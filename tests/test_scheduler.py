@@ -0,0 +1,48 @@
+import pytest
+from datetime import timedelta
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+# scheduler importa o envio de e-mail (sib_api_v3_sdk)
+scheduler = pytest.importorskip("scheduler")
+
+
+@pytest.mark.parametrize("texto, segundos", [
+    ("45s", 45), ("30m", 1800), ("2h", 7200), ("1d", 86400), (" 15M ", 900),
+])
+def test_interpretar_intervalo(texto, segundos):
+    assert scheduler.interpretar_intervalo(texto) == segundos
+
+
+@pytest.mark.parametrize("texto", ["", "m", "30", "0m", "-5m", "1.5h", "2w", "trinta m"])
+def test_interpretar_intervalo_invalido(texto):
+    with pytest.raises(ValueError):
+        scheduler.interpretar_intervalo(texto)
+
+
+def test_gatilho_por_intervalo():
+    gatilho = scheduler.criar_gatilho({"every": "30m", "cron": ""})
+    assert isinstance(gatilho, IntervalTrigger)
+    assert gatilho.interval == timedelta(minutes=30)
+    assert gatilho.jitter is None
+
+
+def test_gatilho_padrao_e_diario_com_jitter():
+    gatilho = scheduler.criar_gatilho({"jitter": 60})
+    assert gatilho.interval == timedelta(days=1)
+    assert gatilho.jitter == 60
+
+
+def test_cron_substitui_every():
+    gatilho = scheduler.criar_gatilho({"every": "30m", "cron": "0 */2 * * 1-5"})
+    assert isinstance(gatilho, CronTrigger)
+    campos = {campo.name: str(campo) for campo in gatilho.fields}
+    assert campos["minute"] == "0"
+    assert campos["hour"] == "*/2"
+    assert campos["day_of_week"] == "1-5"
+
+
+@pytest.mark.parametrize("cron", ["0 */2 * *", "0 */2 * * * *"])
+def test_cron_com_numero_errado_de_campos(cron):
+    with pytest.raises(ValueError, match="5 campos"):
+        scheduler.criar_gatilho({"cron": cron})
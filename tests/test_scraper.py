@@ -0,0 +1,249 @@
+from datetime import date, timedelta
+import pytest
+from scraper import Scraper, url_do_paciente
+
+
+class DriverFalso:
+    """
+    Devolve, a cada leitura dos campos, o próximo documento da lista (o último se repete).
+    """
+
+    def __init__(self, documentos):
+        self.documentos = list(documentos)
+
+    def execute_script(self, script, *args):
+        if len(self.documentos) > 1:
+            return self.documentos.pop(0)
+        return self.documentos[0]
+
+
+@pytest.fixture
+def criar_scraper(monkeypatch):
+    monkeypatch.setenv("LINK_BASE", "https://portal.local/pep?id=")
+    monkeypatch.setenv("ID_BASE", "100")
+
+    def criar(documentos, sem_espera=False, pipeline=False):
+        instancia = Scraper(DriverFalso(documentos))
+        instancia.pipeline = pipeline
+        # browser.lean com page_load_strategy 'none'
+        instancia._carregamento_sem_espera = sem_espera
+        return instancia
+
+    return criar
+
+
+@pytest.mark.parametrize("url, id_paciente, esperado", [
+    ("https://x/pep?id=123", 123, True),
+    ("https://x/pep/123", "123", True),
+    ("https://x/pep?id=0123", 123, True),
+    ("https://x/pep?id=122", 123, False),
+    ("https://x/pep?id=1123", 123, False),
+    ("https://x/pep?id=123&aba=1", 123, False),
+    ("about:blank", 123, False),
+    (None, 123, False),
+])
+def test_url_do_paciente(url, id_paciente, esperado):
+    assert url_do_paciente(url, id_paciente) is esperado
+
+
+def test_validate_patient_descarta_documento_anterior(criar_scraper):
+    instancia = criar_scraper([
+        ["https://portal.local/pep?id=122", "Paciente Anterior", "30a 1m 2d", None],
+        ["https://portal.local/pep?id=123", "Paciente Certo", "40a 0m 0d", None],
+    ], sem_espera=True)
+    assert instancia.validate_patient(123) == (True, "Paciente Certo")
+
+
+def test_validate_patient_no_pipeline_descarta_aba_pre_carregada_antiga(criar_scraper):
+    instancia = criar_scraper([
+        ["https://portal.local/pep?id=122", "Paciente Anterior", "30a 1m 2d", None],
+        ["https://portal.local/pep?id=123", "Paciente Certo", "40a 0m 0d", None],
+    ], pipeline=True)
+    assert instancia.validate_patient(123) == (True, "Paciente Certo")
+
+
+def test_validate_patient_sem_conferencia_aceita_primeiro_documento(criar_scraper):
+    instancia = criar_scraper([
+        ["https://portal.local/pep?id=122", "Paciente Anterior", "30a 1m 2d", None],
+    ])
+    assert instancia.validate_patient(123) == (True, "Paciente Anterior")
+
+
+def test_validate_patient_expira_se_documento_nunca_muda(criar_scraper, monkeypatch):
+    instancia = criar_scraper([
+        ["https://portal.local/pep?id=122", "Paciente Anterior", "30a 1m 2d", None],
+    ], sem_espera=True)
+    monkeypatch.setattr(instancia.wait, "_timeout", 0.3)
+    assert instancia.validate_patient(123) == (False, None)
+
+
+@pytest.fixture
+def campo_data(monkeypatch):
+    import seletores
+
+    def configurar(valor):
+        monkeypatch.setitem(seletores.grupo("pagina"), "campo_data", valor)
+
+    return configurar
+
+
+def test_limites_por_datas_exige_campo_data(criar_scraper, campo_data, banco):
+    campo_data("")
+    instancia = criar_scraper([None])
+    with pytest.raises(ValueError, match="campo_data"):
+        instancia.limites_por_datas(date(2025, 6, 1), date(2025, 6, 11), 1, 999999)
+
+
+def test_limites_por_datas_sem_nenhuma_data_devolve_none(criar_scraper, campo_data, banco, monkeypatch):
+    campo_data("txtDATA")
+    instancia = criar_scraper([None])
+    monkeypatch.setattr(instancia, "_data_do_id", lambda id_paciente: None)
+    assert instancia.limites_por_datas(date(2025, 6, 1), date(2025, 6, 11), 1, 999999) is None
+
+
+def test_limites_por_datas_encontra_a_faixa(criar_scraper, campo_data, banco, monkeypatch):
+    campo_data("txtDATA")
+    instancia = criar_scraper([None])
+
+    # IDs 1..9000 populados, 100 pacientes por dia a partir de 2025-01-01
+    def data_do_id(id_paciente):
+        if not 1 <= id_paciente <= 9000:
+            return None
+        data = date(2025, 1, 1) + timedelta(days=id_paciente // 100)
+        banco.registrar_amostra_data(id_paciente, data)
+        return data
+
+    monkeypatch.setattr(instancia, "_data_do_id", data_do_id)
+    id_inicio, id_fim = instancia.limites_por_datas(date(2025, 2, 1), date(2025, 2, 7), 1, 999999)
+    # 2025-02-01 é o dia 31 (IDs 3100..3199); 2025-02-07 o dia 37 (IDs 3700..3799)
+    assert 3000 <= id_inicio <= 3100
+    assert 3799 <= id_fim <= 3900
+
+
+def test_filtros_conferidos_a_cada_paciente(criar_scraper, banco, monkeypatch):
+    import scraper
+    instancia = criar_scraper([])
+    validos = {101, 102, 104}
+    # O portal redefine os filtros ao abrir o paciente 104
+    alterados = {101: 2, 104: 1}
+    conferidos = []
+
+    def execute_script(script, *args):
+        assert script == scraper._SCRIPT_FILTROS_TODOS
+        conferidos.append(instancia._id_aberto)
+        return {"total": 2, "alterados": alterados.get(instancia._id_aberto, 0), "sem_opcao": 0}
+
+    instancia.driver.execute_script = execute_script
+    monkeypatch.setattr(instancia, "_classificar_por_sonda", lambda *args: None)
+    monkeypatch.setattr(instancia, "_navegar", lambda id_atual, *args: setattr(instancia, "_id_aberto", id_atual))
+    monkeypatch.setattr(instancia, "validate_patient", lambda id_atual: (id_atual in validos, "P" if id_atual in validos else None))
+    monkeypatch.setattr(instancia, "scraping_extension", lambda *args: None)
+    monkeypatch.setattr(instancia, "_verificar_reciclagem", lambda: None)
+    instancia._executar_fase("para_cima", 101, 104)
+    # Conferidos em cada paciente aberto, inclusive depois de já terem sido aplicados
+    assert conferidos == [101, 102, 104]
+
+
+def _portal_com_lacunas(banco, sondados):
+    """
+    IDs 1..9000 com 100 pacientes por dia a partir de 2025-01-01, um em cada três IDs em branco
+    e trechos longos em branco antes, dentro e depois da janela de fevereiro (IDs 3100..3799).
+    """
+    lacunas = [(1500, 2900), (3000, 3095), (3300, 3360), (5000, 5600)]
+
+    def data_do_id(id_paciente):
+        sondados.append(id_paciente)
+        if not 1 <= id_paciente <= 9000 or id_paciente % 3 == 0:
+            return False
+        if any(inicio <= id_paciente <= fim for inicio, fim in lacunas):
+            return False
+        data = date(2025, 1, 1) + timedelta(days=id_paciente // 100)
+        banco.registrar_amostra_data(id_paciente, data)
+        return data
+
+    return data_do_id
+
+
+@pytest.mark.parametrize("id_maximo", [9500, 999999])
+def test_limites_por_datas_com_lacunas_longas_cobre_a_janela(criar_scraper, campo_data, banco, monkeypatch, id_maximo):
+    campo_data("txtDATA")
+    instancia = criar_scraper([None])
+    sondados = []
+    monkeypatch.setattr(instancia, "_data_do_id", _portal_com_lacunas(banco, sondados))
+    id_inicio, id_fim = instancia.limites_por_datas(date(2025, 2, 1), date(2025, 2, 7), 1, id_maximo)
+    assert id_inicio <= 3100 and id_fim >= 3799
+    assert id_fim - id_inicio < 2500
+    assert len(sondados) <= 2 * 150
+
+
+def test_data_do_id_em_branco_na_sonda_nao_abre_o_navegador(criar_scraper, banco):
+    instancia = criar_scraper([None])
+    instancia.config_sonda = {"enabled": True}
+    instancia.sonda = type("Sonda", (), {"data_paciente": lambda self, id_paciente: False})()
+    instancia.driver.get = lambda url: pytest.fail("ID em branco aberto no navegador")
+    assert instancia._data_do_id(123) is False
+
+
+def _populado_esparso(id_paciente):
+    """
+    Um em cada três IDs populado até 5000, com um trecho de 60 IDs em branco logo após o 999.
+    """
+    return id_paciente % 3 == 0 and not 1000 <= id_paciente <= 1060 and id_paciente <= 5000
+
+
+CONFIG_FRONTEIRA = {"blank_streak": 50, "probe_budget": 20}
+
+
+def test_fronteira_com_dados_esparsos(criar_scraper, monkeypatch):
+    instancia = criar_scraper([None])
+    monkeypatch.setattr(instancia, "_id_populado", _populado_esparso)
+    fronteira, _ = instancia._buscar_fronteira(999, 'para_cima', 999999, CONFIG_FRONTEIRA)
+    assert 5000 - 50 <= fronteira <= 5000
+
+
+def test_fronteira_para_baixo(criar_scraper, monkeypatch):
+    instancia = criar_scraper([None])
+    monkeypatch.setattr(instancia, "_id_populado", lambda i: i >= 2000 and i % 3 == 0)
+    fronteira, _ = instancia._buscar_fronteira(9000, 'para_baixo', 1, CONFIG_FRONTEIRA)
+    assert 2000 <= fronteira <= 2000 + 50
+
+
+def test_fronteira_sem_janela_em_branco_nao_estima(criar_scraper, monkeypatch):
+    instancia = criar_scraper([None])
+    monkeypatch.setattr(instancia, "_id_populado", lambda i: True)
+    fronteira, ultimo = instancia._buscar_fronteira(1000, 'para_cima', 999999, {"blank_streak": 50, "probe_budget": 5})
+    assert fronteira is None
+    assert ultimo > 1000
+
+
+def test_janela_populada_para_no_limite(criar_scraper, monkeypatch):
+    instancia = criar_scraper([None])
+    sondados = []
+    monkeypatch.setattr(instancia, "_id_populado", lambda i: sondados.append(i) or False)
+    assert instancia._janela_populada(10, 1, 11, 3) is None
+    assert sondados == [10, 11]
+
+
+def test_pipeline_sem_confirmacao_do_painel_recarrega_a_pagina(criar_scraper, monkeypatch):
+    import scraper
+    instancia = criar_scraper([], pipeline=True)
+    esperas, recargas = [], []
+    instancia.driver.switch_to = type("SwitchTo", (), {"default_content": lambda self: None})()
+    instancia.driver.refresh = lambda: recargas.append(True)
+
+    def aguardar_estado(driver, condicoes, timeout=15, nome_esperado=None):
+        esperas.append((condicoes, nome_esperado))
+        return None
+
+    monkeypatch.setattr(scraper.painel, "aguardar_estado", aguardar_estado)
+    instancia.scraping_extension("123", "Maria", None, None)
+    assert esperas == [("paciente_atual", "Maria"), (["paciente_nao_encontrado", "paciente_encontrado"], None)]
+    assert recargas == [True]
+
+
+@pytest.mark.parametrize("estrategia, sem_espera", [("none", True), ("eager", False), (None, False)])
+def test_carregamento_sem_espera_segue_a_sessao(criar_scraper, estrategia, sem_espera):
+    driver = DriverFalso([])
+    if estrategia:
+        driver.capabilities = {"pageLoadStrategy": estrategia}
+    assert Scraper(driver)._carregamento_sem_espera is sem_espera
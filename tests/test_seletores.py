@@ -0,0 +1,12 @@
+import pytest
+import seletores
+
+
+def test_seletor_ausente_cita_o_arquivo_de_seletores(tmp_path, monkeypatch):
+    arquivo = tmp_path / "meus_seletores.yaml"
+    arquivo.write_text("painel:\n  nome_paciente: '#nome'\n", encoding="utf-8")
+    monkeypatch.setattr(seletores, "carregar_config", lambda: {"selectors_file": str(arquivo)})
+    monkeypatch.setattr(seletores, "_seletores_cache", None)
+    monkeypatch.setattr(seletores, "_seletores_caminho", seletores.SELETORES_FILE)
+    with pytest.raises(KeyError, match="meus_seletores.yaml"):
+        seletores.PainelExtensao(None).encontrar("link_entrar")
@@ -0,0 +1,95 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import seletores
+from sonda import SondaHttp
+
+CAMPO_NOME = seletores.seletor("pagina", "campo_nome")
+CAMPO_IDADE = seletores.seletor("pagina", "campo_idade")
+
+PAGINA_EM_BRANCO = f"""
+<html><body>
+<input id="{CAMPO_NOME}" value="">
+<div id="{CAMPO_IDADE}">0m 0d</div>
+</body></html>
+"""
+
+PAGINA_PREENCHIDA = f"""
+<html><body>
+<input id="{CAMPO_NOME}" value="MARIA DA SILVA">
+<div id="{CAMPO_IDADE}">45a 3m 2d</div>
+</body></html>
+"""
+
+PAGINA_LOGIN = """
+<html><body><form><input name="usuario"><input name="senha" type="password"></form></body></html>
+"""
+
+PAGINAS = {"1": PAGINA_EM_BRANCO, "2": PAGINA_PREENCHIDA, "3": PAGINA_LOGIN}
+
+
+@pytest.fixture
+def portal_local():
+    """
+    Portal falso: /pep?id=N devolve a página N e guarda o cabeçalho Cookie de cada requisição.
+    """
+    cookies_recebidos = []
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            cookies_recebidos.append(self.headers.get("Cookie"))
+            id_paciente = parse_qs(urlparse(self.path).query).get("id", [""])[0]
+            corpo = PAGINAS.get(id_paciente)
+            if corpo is None:
+                self.send_error(404)
+                return
+            dados = corpo.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manipulador)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/pep?id=", cookies_recebidos
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_sondar_varios_classifica_as_paginas(portal_local):
+    url_base, _ = portal_local
+    sonda = SondaHttp(url_base, concorrencia=3, timeout=5)
+    try:
+        assert sonda.sondar_varios([1, 2, 3, 404]) == {1: False, 2: True, 3: None, 404: None}
+    finally:
+        sonda.fechar()
+
+
+def test_cookies_do_navegador_sao_enviados(portal_local):
+    url_base, cookies_recebidos = portal_local
+    sonda = SondaHttp(url_base, timeout=5)
+    try:
+        sonda.atualizar_cookies([
+            {"name": "ASP.NET_SessionId", "value": "abc123", "domain": "127.0.0.1", "path": "/"},
+        ])
+        assert sonda.sondar(2) is True
+    finally:
+        sonda.fechar()
+    assert cookies_recebidos == ["ASP.NET_SessionId=abc123"]
+
+
+def test_data_paciente_distingue_pagina_em_branco(portal_local):
+    url_base, _ = portal_local
+    sonda = SondaHttp(url_base, timeout=5)
+    try:
+        # Em branco: False (o navegador não precisa confirmar); preenchida sem campo de data: None
+        assert sonda.data_paciente(1) is False
+        assert sonda.data_paciente(2) is None
+    finally:
+        sonda.fechar()